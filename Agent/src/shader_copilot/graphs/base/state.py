@@ -4,14 +4,40 @@ Base state definitions shared across all graphs.
 Defines the session-level state that persists across graph invocations.
 """
 
-from datetime import datetime
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from typing import Annotated, Optional
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field
 from langgraph.graph.message import add_messages
 
+# History budget in characters (~4 characters per token). Once exceeded, the
+# oldest half of the conversation is folded into a single summary message.
+MAX_HISTORY_TOKENS = 8000
+MAX_HISTORY_CHARS = MAX_HISTORY_TOKENS * 4
+
+# Number of most recent messages kept ready for context building
+DEFAULT_CONTEXT_MESSAGES = 10
+
+# Characters of each compacted message kept in the summary, and of the
+# summary itself (older entries are dropped first)
+SUMMARY_SNIPPET_CHARS = 200
+MAX_SUMMARY_CHARS = MAX_HISTORY_CHARS // 4
+
+
+def _shallow_dict(obj) -> dict:
+    """Convert a dataclass to a dict without deep-copying its values."""
+    return {f.name: getattr(obj, f.name) for f in fields(obj) if f.init}
+
+
+def _known_fields(cls, data: dict) -> dict:
+    """Drop keys that are not fields of ``cls`` (extra keys are ignored)."""
+    names = {f.name for f in fields(cls) if f.init}
+    return {k: v for k, v in data.items() if k in names}
+
 
 class SessionStatus(str, Enum):
     """Session lifecycle status."""
@@ -29,19 +55,26 @@ class MessageRole(str, Enum):
     SYSTEM = "system"
 
 
-class Message(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Message:
     """A single message in the conversation."""
 
-    message_id: UUID = Field(default_factory=uuid4)
+    message_id: str = field(default_factory=lambda: secrets.token_hex(8))
     role: MessageRole
     content: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    images: list[dict] = Field(default_factory=list)
-    artifacts: list[str] = Field(default_factory=list)
-    metadata: dict = Field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+    images: list[dict] = field(default_factory=list)
+    artifacts: list[str] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Message":
+        """Create from dictionary."""
+        return cls(**{**_known_fields(cls, data), "role": MessageRole(data["role"])})
 
 
-class ModelConfig(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ModelConfig:
     """Configuration for LLM models."""
 
     router_model: str = "qwen-turbo"
@@ -49,15 +82,25 @@ class ModelConfig(BaseModel):
     vl_model: str = "qwen-vl-plus"
 
 
-class SessionConfig(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SessionConfig:
     """Configuration for a session."""
 
     output_directory: str = "Assets/Shaders/Generated"
     max_retry_count: int = 3
-    model_config: ModelConfig = Field(default_factory=ModelConfig)
+    model_config: ModelConfig = field(default_factory=ModelConfig)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionConfig":
+        """Create from dictionary."""
+        model_config = ModelConfig(
+            **_known_fields(ModelConfig, data.get("model_config", {}))
+        )
+        return cls(**{**_known_fields(cls, data), "model_config": model_config})
 
 
-class SessionState(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SessionState:
     """
     Global shared state for a session.
 
@@ -65,37 +108,112 @@ class SessionState(BaseModel):
     """
 
     # Session identity
-    session_id: UUID = Field(default_factory=uuid4)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    session_id: UUID = field(default_factory=uuid4)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
     status: SessionStatus = SessionStatus.ACTIVE
 
     # Configuration
-    config: SessionConfig = Field(default_factory=SessionConfig)
+    config: SessionConfig = field(default_factory=SessionConfig)
     project_path: str = ""
 
     # Conversation history
-    conversation_history: list[Message] = Field(default_factory=list)
+    conversation_history: list[Message] = field(default_factory=list)
 
     # Current task tracking
     current_task_id: Optional[UUID] = None
 
+    # Running size of conversation_history contents, kept in step by add_message
+    _history_chars: int = field(default=0, init=False, repr=False)
+
+    # References to the latest messages, so context lookups skip the full list
+    _recent: deque = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._history_chars = sum(len(m.content) for m in self.conversation_history)
+        self._recent = deque(
+            self.conversation_history[-DEFAULT_CONTEXT_MESSAGES:],
+            maxlen=DEFAULT_CONTEXT_MESSAGES,
+        )
+
     def add_message(self, role: MessageRole, content: str, **kwargs) -> Message:
         """Add a message to conversation history."""
         message = Message(role=role, content=content, **kwargs)
         self.conversation_history.append(message)
-        self.updated_at = datetime.utcnow()
+        self._recent.append(message)
+        self._history_chars += len(content)
+        if self._history_chars > MAX_HISTORY_CHARS:
+            self._compact_history()
+        self.updated_at = time.time()
         return message
 
-    def get_context_messages(self, max_messages: int = 10) -> list[Message]:
+    def _compact_history(self) -> None:
+        """Fold the oldest half of the history into one summary message."""
+        history = self.conversation_history
+        split = len(history) // 2
+        if split < 2:
+            return
+
+        entries: list[str] = []
+        for m in history[:split]:
+            if m.metadata.get("summary"):
+                # Carry an earlier summary forward instead of re-summarizing it
+                entries.extend(m.content.splitlines()[1:])
+                continue
+            snippet = m.content[:SUMMARY_SNIPPET_CHARS]
+            if len(m.content) > SUMMARY_SNIPPET_CHARS:
+                snippet += "..."
+            entries.append(f"- {m.role.value}: {snippet}")
+
+        size = sum(len(e) + 1 for e in entries)
+        start = 0
+        while size > MAX_SUMMARY_CHARS and start < len(entries) - 1:
+            size -= len(entries[start]) + 1
+            start += 1
+
+        summary = Message(
+            role=MessageRole.SYSTEM,
+            content="\n".join(["Summary of earlier conversation:", *entries[start:]]),
+            metadata={"summary": True},
+        )
+
+        self.conversation_history = [summary, *history[split:]]
+        self._history_chars = sum(len(m.content) for m in self.conversation_history)
+        self._recent = deque(
+            self.conversation_history[-DEFAULT_CONTEXT_MESSAGES:],
+            maxlen=DEFAULT_CONTEXT_MESSAGES,
+        )
+
+    def get_context_messages(
+        self, max_messages: int = DEFAULT_CONTEXT_MESSAGES
+    ) -> list[Message]:
         """Get recent messages for context."""
+        if 0 < max_messages <= DEFAULT_CONTEXT_MESSAGES:
+            return list(self._recent)[-max_messages:]
         return self.conversation_history[-max_messages:]
 
     def to_dict(self) -> dict:
         """Convert to dictionary for serialization."""
-        return self.model_dump()
+        data = _shallow_dict(self)
+        data["config"] = {
+            **_shallow_dict(self.config),
+            "model_config": _shallow_dict(self.config.model_config),
+        }
+        data["conversation_history"] = [
+            _shallow_dict(m) for m in self.conversation_history
+        ]
+        return data
 
     @classmethod
     def from_dict(cls, data: dict) -> "SessionState":
         """Create from dictionary."""
-        return cls.model_validate(data)
+        return cls(
+            **{
+                **_known_fields(cls, data),
+                "status": SessionStatus(data.get("status", SessionStatus.ACTIVE)),
+                "config": SessionConfig.from_dict(data.get("config", {})),
+                "conversation_history": [
+                    Message.from_dict(m) for m in data.get("conversation_history", [])
+                ],
+            }
+        )
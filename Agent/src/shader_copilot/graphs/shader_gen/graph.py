@@ -4,13 +4,19 @@ Shader Generation Graph using LangGraph.
 Implements the text-to-shader generation workflow with image support.
 """
 
+import inspect
+import threading
 from typing import Any, Literal
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 from langgraph.graph import END, StateGraph
 from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
 
 from shader_copilot.graphs.shader_gen.nodes import (
-    analyze_image,
+    analyze_parallel,
     analyze_requirement,
     check_should_compile,
     check_should_retry,
@@ -20,26 +26,29 @@ from shader_copilot.graphs.shader_gen.nodes import (
     generate_shader,
     handle_compile_result,
     prepare_retry,
+    request_compile,
     validate_shader,
 )
 from shader_copilot.graphs.shader_gen.state import ShaderGenState
 
 
-def check_has_image(state: ShaderGenState) -> Literal["analyze_image", "analyze"]:
+def check_has_image(state: ShaderGenState) -> Literal["analyze_parallel", "analyze"]:
     """Conditional edge: check if image analysis is needed."""
-    if state.reference_image:
-        return "analyze_image"
+    if state.has_reference_image:
+        return "analyze_parallel"
     return "analyze"
 
 
-def create_shader_gen_graph() -> CompiledStateGraph:
+def create_shader_gen_graph(
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> CompiledStateGraph:
     """
     Create the shader generation graph.
 
     Graph Structure:
 
-    START --+--[has_image]--> analyze_image -> analyze -> generate -> validate --+
-            |                                                                     |
+    START --+--[has_image]--> analyze_parallel ----------> generate -> validate --+
+            |                 (image + text)                                      |
             +--[no_image]--> analyze ---------> generate -> validate --+          |
                                                                        |          |
                     +-- fix <--[invalid]-------------------------------+----------+
@@ -47,12 +56,19 @@ def create_shader_gen_graph() -> CompiledStateGraph:
                     +-> validate <----+                                      [valid]
                                       |                                           |
                                       |                                           v
-                    retry <-[retry]-- compile_check <--[compile]-- (wait for tool response)
+                    retry <-[retry]-- compile_check <--[compile]-- (interrupt for tool response)
                       |                    |
                       |               [success]
                       |                    |
                       +--[fail]--> FAIL    +-> SUCCESS -> END
 
+    The compile step interrupts the graph and is resumed with
+    ``Command(resume=compile_result)``. Interrupts need a checkpointer, so
+    without one the graph ends after validation instead.
+
+    Args:
+        checkpointer: Checkpointer enabling the compile interrupt
+
     Returns:
         Compiled state graph
     """
@@ -60,11 +76,12 @@ def create_shader_gen_graph() -> CompiledStateGraph:
     builder = StateGraph(ShaderGenState)
 
     # Add nodes
-    builder.add_node("analyze_image", analyze_image)
+    builder.add_node("analyze_parallel", analyze_parallel)
     builder.add_node("analyze", analyze_requirement)
     builder.add_node("generate", generate_shader)
     builder.add_node("validate", validate_shader)
     builder.add_node("fix", fix_validation_errors)
+    builder.add_node("compile", request_compile)
     builder.add_node("compile_check", handle_compile_result)
     builder.add_node("retry", prepare_retry)
     builder.add_node("success", finalize_success)
@@ -74,13 +91,13 @@ def create_shader_gen_graph() -> CompiledStateGraph:
     builder.set_conditional_entry_point(
         check_has_image,
         {
-            "analyze_image": "analyze_image",
+            "analyze_parallel": "analyze_parallel",
             "analyze": "analyze",
         },
     )
 
-    # Image analysis leads to requirement analysis
-    builder.add_edge("analyze_image", "analyze")
+    # Image and requirement analysis run together on the image path
+    builder.add_edge("analyze_parallel", "generate")
     builder.add_edge("analyze", "generate")
     builder.add_edge("generate", "validate")
 
@@ -89,14 +106,16 @@ def create_shader_gen_graph() -> CompiledStateGraph:
         "validate",
         check_should_compile,
         {
-            "compile": END,  # Pause for tool call (compile_shader)
+            # Without a checkpointer, stop here and leave compilation to the caller
+            "compile": "compile" if checkpointer else END,
             "fix": "fix",
         },
     )
 
     builder.add_edge("fix", "validate")
+    builder.add_edge("compile", "compile_check")
 
-    # After compilation result received (via state update):
+    # After compilation result received (via resume):
     # compile_check -> retry, fail, or success
     builder.add_conditional_edges(
         "compile_check",
@@ -112,7 +131,7 @@ def create_shader_gen_graph() -> CompiledStateGraph:
     builder.add_edge("success", END)
     builder.add_edge("fail", END)
 
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
 
 
 class ShaderGenRunner:
@@ -123,7 +142,7 @@ class ShaderGenRunner:
     """
 
     def __init__(self):
-        self.graph = create_shader_gen_graph()
+        self.graph = get_shader_gen_graph()
 
     async def run(
         self,
@@ -145,7 +164,8 @@ class ShaderGenRunner:
             user_requirement: User's shader description
             session_id: Session identifier
             max_retries: Maximum compilation retries
-            reference_image: Optional reference image (bytes or base64 string)
+            reference_image: Optional reference image (bytes, base64 string
+                or http(s) URL)
             reference_image_mime: MIME type of the reference image
             previous_code: Existing shader code for modifications
             is_modification: Whether this is modifying an existing shader
@@ -156,19 +176,26 @@ class ShaderGenRunner:
         Returns:
             Final state with generated shader
         """
-        # Handle image input
+        # Handle image input; base64 payloads are kept encoded since the
+        # vision model consumes them that way
         image_bytes = None
+        image_b64 = None
+        image_url = None
         if reference_image:
-            if isinstance(reference_image, str):
-                # Assume base64 encoded
+            if isinstance(reference_image, str) and reference_image.startswith(
+                ("http://", "https://")
+            ):
+                # Remote images are fetched by the model provider directly
+                image_url = reference_image
+            elif isinstance(reference_image, str):
                 from shader_copilot.utils.image_utils import (
-                    decode_base64_to_bytes,
-                    extract_mime_type,
+                    sniff_image_mime,
+                    split_data_url,
                 )
 
-                image_bytes = decode_base64_to_bytes(reference_image)
+                url_mime, image_b64 = split_data_url(reference_image)
                 if not reference_image_mime:
-                    reference_image_mime = extract_mime_type(reference_image)
+                    reference_image_mime = url_mime or sniff_image_mime(image_b64)
             else:
                 image_bytes = reference_image
 
@@ -178,66 +205,79 @@ class ShaderGenRunner:
             session_id=session_id,
             max_retries=max_retries,
             reference_image=image_bytes,
+            reference_image_b64=image_b64,
+            image_url_cache=image_url,
             reference_image_mime=reference_image_mime or "image/png",
             previous_code=previous_code,
             is_modification=is_modification,
             conversation_context=conversation_context,
         )
 
-        # Run graph until it needs a tool call
+        # Run the graph, resuming it with the tool result each time it
+        # pauses for compilation
         current_state = initial_state
-
-        while True:
-            # Run the graph
-            result = await self.graph.ainvoke(current_state)
-            current_state = ShaderGenState(**result)
-
-            # Check if we need to compile
-            if current_state.validation_passed and not current_state.is_complete:
-                # Request compilation from Unity
-                if on_tool_call:
-                    compile_result = await on_tool_call(
-                        "compile_shader",
-                        {
-                            "code": current_state.generated_code,
-                            "shader_name": self._extract_shader_name(
-                                current_state.generated_code
-                            ),
-                        },
-                    )
-
-                    # Update state with compile result
-                    current_state.compile_result = compile_result
-
-                    # Resume from compile_check node
-                    result = await self.graph.ainvoke(
-                        current_state, {"checkpoint_id": "compile_check"}
-                    )
-                    current_state = ShaderGenState(**result)
-                else:
-                    # No tool call handler, assume success for testing
+        thread_id = str(initial_state.task_id)
+        config = {"configurable": {"thread_id": thread_id}}
+        graph_input: ShaderGenState | Command = initial_state
+
+        try:
+            while True:
+                tool_args = None
+                async for chunk in self.graph.astream(
+                    graph_input, config, stream_mode="updates"
+                ):
+                    if "__interrupt__" in chunk:
+                        tool_args = chunk["__interrupt__"][0].value
+                        continue
+                    for update in chunk.values():
+                        if update:
+                            self._merge(current_state, update)
+                            if on_progress and "current_stage" in update:
+                                progress = on_progress(update["current_stage"])
+                                if inspect.isawaitable(progress):
+                                    await progress
+
+                # Graph finished, or paused for compilation with nobody to
+                # compile (assume success for testing)
+                if tool_args is None or not on_tool_call:
                     break
 
-            if current_state.is_complete:
-                break
+                compile_result = await on_tool_call("compile_shader", tool_args)
+                graph_input = Command(resume=compile_result)
+        finally:
+            await self.graph.checkpointer.adelete_thread(thread_id)
 
         return current_state
 
-    def _extract_shader_name(self, code: str) -> str:
-        """Extract shader name from code."""
-        import re
-
-        match = re.search(r'Shader\s+"([^"]+)"', code)
-        return match.group(1) if match else "Generated/Shader"
-
+    @staticmethod
+    def _merge(state: ShaderGenState, update: dict[str, Any]) -> None:
+        """Apply a node's update to the runner's state in place."""
+        for key, value in update.items():
+            setattr(state, key, value)
+
+
+# State types restored from checkpoints when the graph resumes
+_CHECKPOINT_SERDE = JsonPlusSerializer(
+    allowed_msgpack_modules=[
+        ("shader_copilot.graphs.shader_gen.state", "CompileError"),
+        ("shader_copilot.graphs.shader_gen.state", "CompileResult"),
+        ("shader_copilot.graphs.shader_gen.state", "CompileStatus"),
+        ("shader_copilot.graphs.shader_gen.state", "TextureSlot"),
+    ]
+)
 
 # Create default instance
 _shader_gen_graph: CompiledStateGraph | None = None
+_shader_gen_graph_lock = threading.Lock()
 
 
 def get_shader_gen_graph() -> CompiledStateGraph:
-    """Get or create the shader generation graph."""
+    """Get or create the shared, checkpointed shader generation graph."""
     global _shader_gen_graph
     if _shader_gen_graph is None:
-        _shader_gen_graph = create_shader_gen_graph()
+        with _shader_gen_graph_lock:
+            if _shader_gen_graph is None:
+                _shader_gen_graph = create_shader_gen_graph(
+                    InMemorySaver(serde=_CHECKPOINT_SERDE)
+                )
     return _shader_gen_graph
@@ -4,12 +4,18 @@ Shader generation graph nodes.
 Each node is a function that takes state and returns updates.
 """
 
-import base64
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from contextlib import aclosing
 from typing import Any, Literal, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.types import interrupt
 
 from shader_copilot.graphs.shader_gen.state import (
+    CompileError,
     CompileResult,
     CompileStatus,
     ShaderGenState,
@@ -19,6 +25,142 @@ from shader_copilot.models.model_manager import (
     ModelRole,
     get_model_manager,
 )
+from shader_copilot.utils.image_utils import b64encode_as_string
+
+# First fenced block: the opening fence line (with optional language tag)
+# up to the next fence line, or to the end of an unterminated block.
+_CODE_FENCE_RE = re.compile(
+    r"^[^\S\n]*```[^\n]*\n(.*?)(?:(^[^\S\n]*```)|\Z)", re.MULTILINE | re.DOTALL
+)
+
+_SHADER_NAME_RE = re.compile(r'Shader\s+"([^"]+)"')
+
+# Structural markers every generated shader must contain, with the error
+# reported when one is missing. Built once at import; checked in order.
+_MARKERS: tuple[tuple[str, str], ...] = (
+    ('Shader "', "Missing Shader declaration"),
+    ("SubShader", "Missing SubShader block"),
+    ("Pass", "Missing Pass block"),
+    ("#pragma vertex", "Missing #pragma vertex directive"),
+    ("#pragma fragment", "Missing #pragma fragment directive"),
+    (
+        "com.unity.render-pipelines",
+        "Missing URP include (Packages/com.unity.render-pipelines.universal/...)",
+    ),
+    ("HLSLPROGRAM", "Missing HLSLPROGRAM block (using CGPROGRAM instead of HLSL?)"),
+    ("ENDHLSL", "Missing ENDHLSL"),
+)
+
+# Image analyses keyed by image content digest, so retries and follow-up
+# modifications with the same reference image skip the vision call.
+_IMAGE_ANALYSIS_CACHE_SIZE = 128
+_image_analysis_cache: OrderedDict[str, str] = OrderedDict()
+
+
+# =============================================================================
+# Prompts
+# =============================================================================
+
+# System messages are immutable by convention, so one instance is shared by
+# every invocation of a node.
+_SYS_ANALYZE_IMAGE = SystemMessage(
+    content="""You are a visual effects expert analyzing images for shader recreation.
+Describe the visual elements, lighting, colors, and special effects visible in the image.
+
+Focus on aspects that can be recreated with shaders:
+- **Art Style**: Is it toon/cel-shaded, realistic PBR, pixel art, watercolor, etc.?
+- **Color Palette**: What are the dominant colors and their relationships?
+- **Lighting**: What kind of lighting is used (rim light, ambient, directional)?
+- **Surface Properties**: Is it metallic, rough, glossy, matte?
+- **Special Effects**: Any glow, outline, distortion, gradient effects?
+- **Shading Model**: Number of color bands, gradient smoothness, shadow colors
+
+Provide a structured analysis that can guide shader generation."""
+)
+
+_SYS_ANALYZE_REQ = SystemMessage(
+    content="""You are a shader expert. Analyze the user's shader requirement and extract:
+
+1. **Shader Type**: What kind of shader is needed (surface shader, unlit, post-process effect, etc.)
+2. **Visual Effects**: What visual effects are requested (rim lighting, outline, dissolve, etc.)
+3. **Properties**: What parameters should be exposed (colors, textures, floats, etc.)
+4. **Technical Notes**: Any special requirements (transparency, double-sided, etc.)
+
+Format your response as a structured analysis.
+Keep it concise and technical."""
+)
+
+_SYS_GEN_MOD = SystemMessage(
+    content="""You are an expert Unity shader programmer specializing in URP (Universal Render Pipeline).
+You are MODIFYING an existing shader based on the user's request.
+
+CRITICAL RULES:
+1. Preserve the overall structure of the existing shader
+2. Only change what the user specifically requests
+3. Keep all existing properties unless explicitly asked to remove
+4. Maintain URP compatibility
+5. Keep the shader working and compilable
+
+Respond with ONLY the complete modified shader code. No explanations before or after."""
+)
+
+_SYS_GEN_NEW = SystemMessage(
+    content="""You are an expert Unity shader programmer specializing in URP (Universal Render Pipeline).
+Generate a complete, valid HLSL shader for Unity URP based on the requirements.
+
+CRITICAL RULES:
+1. Use URP shader structure with proper includes
+2. Include all necessary pragmas (#pragma vertex, #pragma fragment)
+3. Use HLSL syntax, not CG
+4. Include proper CBUFFER for material properties
+5. Use TEXTURE2D and SAMPLER macros for textures
+6. Include proper Tags for URP compatibility
+
+Shader Structure Template:
+```hlsl
+Shader "Custom/ShaderName"
+{
+    Properties
+    {
+        // Exposed properties
+    }
+    SubShader
+    {
+        Tags { "RenderType"="Opaque" "RenderPipeline"="UniversalPipeline" }
+        
+        Pass
+        {
+            HLSLPROGRAM
+            #pragma vertex vert
+            #pragma fragment frag
+            
+            #include "Packages/com.unity.render-pipelines.universal/ShaderLibrary/Core.hlsl"
+            
+            // Structs, CBUFFER, functions
+            ENDHLSL
+        }
+    }
+}
+```
+
+Respond with ONLY the complete shader code. No explanations before or after."""
+)
+
+_FIX_PROMPT = """You are a shader debugging expert. Fix the following validation errors in the shader code.
+
+Validation Errors:
+{errors}
+
+Current Shader Code:
+```hlsl
+{code}
+```
+
+Provide the COMPLETE fixed shader code. Ensure all validation issues are resolved."""
+
+_SYS_FIX = SystemMessage(
+    content="Fix the shader validation errors. Output only the corrected shader code."
+)
 
 
 # =============================================================================
@@ -37,38 +179,38 @@ async def analyze_image(state: ShaderGenState) -> dict[str, Any]:
     - Surface properties (metallic, rough, glossy)
     - Special effects (glow, outline, distortion)
     """
-    if not state.reference_image:
+    if not state.has_reference_image:
         return {
             "image_analysis": None,
             "current_stage": "no_image",
         }
 
-    model_manager = get_model_manager()
-
-    analysis_prompt = """You are a visual effects expert analyzing images for shader recreation.
-Describe the visual elements, lighting, colors, and special effects visible in the image.
-
-Focus on aspects that can be recreated with shaders:
-- **Art Style**: Is it toon/cel-shaded, realistic PBR, pixel art, watercolor, etc.?
-- **Color Palette**: What are the dominant colors and their relationships?
-- **Lighting**: What kind of lighting is used (rim light, ambient, directional)?
-- **Surface Properties**: Is it metallic, rough, glossy, matte?
-- **Special Effects**: Any glow, outline, distortion, gradient effects?
-- **Shading Model**: Number of color bands, gradient smoothness, shadow colors
+    cache_key = _image_cache_key(state)
+    cached = _image_analysis_cache.get(cache_key)
+    if cached is not None:
+        _image_analysis_cache.move_to_end(cache_key)
+        return {
+            "image_analysis": cached,
+            "current_stage": "image_analyzed",
+        }
 
-Provide a structured analysis that can guide shader generation."""
+    model_manager = get_model_manager()
 
-    # Convert bytes to base64 if needed
-    if isinstance(state.reference_image, bytes):
-        image_b64 = base64.b64encode(state.reference_image).decode("utf-8")
-    else:
-        image_b64 = state.reference_image
+    # Build the image URL once; retries and remote URLs reuse it as-is
+    image_url = state.image_url_cache
+    if not image_url:
+        # Reuse the original payload if the image arrived base64 encoded
+        if state.reference_image_b64:
+            image_b64 = state.reference_image_b64
+        else:
+            image_b64 = b64encode_as_string(state.reference_image)
 
-    # Determine MIME type
-    mime_type = state.reference_image_mime or "image/png"
+        # Determine MIME type
+        mime_type = state.reference_image_mime or "image/png"
+        image_url = f"data:{mime_type};base64,{image_b64}"
 
     messages = [
-        SystemMessage(content=analysis_prompt),
+        _SYS_ANALYZE_IMAGE,
         HumanMessage(
             content=[
                 {
@@ -77,7 +219,7 @@ Provide a structured analysis that can guide shader generation."""
                 },
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:{mime_type};base64,{image_b64}"},
+                    "image_url": {"url": image_url},
                 },
             ]
         ),
@@ -85,8 +227,13 @@ Provide a structured analysis that can guide shader generation."""
 
     analysis = await model_manager.generate(messages, ModelRole.VISION)
 
+    _image_analysis_cache[cache_key] = analysis
+    if len(_image_analysis_cache) > _IMAGE_ANALYSIS_CACHE_SIZE:
+        _image_analysis_cache.popitem(last=False)
+
     return {
         "image_analysis": analysis,
+        "image_url_cache": image_url,
         "current_stage": "image_analyzed",
     }
 
@@ -104,37 +251,49 @@ async def analyze_requirement(state: ShaderGenState) -> dict[str, Any]:
     """
     model_manager = get_model_manager()
 
-    analysis_prompt = """You are a shader expert. Analyze the user's shader requirement and extract:
-
-1. **Shader Type**: What kind of shader is needed (surface shader, unlit, post-process effect, etc.)
-2. **Visual Effects**: What visual effects are requested (rim lighting, outline, dissolve, etc.)
-3. **Properties**: What parameters should be exposed (colors, textures, floats, etc.)
-4. **Technical Notes**: Any special requirements (transparency, double-sided, etc.)
-
-Format your response as a structured analysis.
-Keep it concise and technical."""
-
     # Build user content with optional image analysis
-    user_content = f"Shader requirement: {state.user_requirement}"
+    parts = [f"Shader requirement: {state.user_requirement}"]
 
     if state.image_analysis:
-        user_content += f"\n\n---\nReference Image Analysis:\n{state.image_analysis}"
-        user_content += "\n\nIncorporate the visual style from the image analysis into your shader analysis."
+        parts.append(f"---\nReference Image Analysis:\n{state.image_analysis}")
+        parts.append(
+            "Incorporate the visual style from the image analysis into your shader analysis."
+        )
+
+    user_content = "\n\n".join(parts)
 
     messages = [
-        SystemMessage(content=analysis_prompt),
+        _SYS_ANALYZE_REQ,
         HumanMessage(content=user_content),
     ]
 
     analysis = await model_manager.generate(messages, ModelRole.ROUTER)
 
     # Combine with image analysis for the next stage
-    combined_analysis = analysis
-    if state.image_analysis:
-        combined_analysis = f"User Requirement Analysis:\n{analysis}\n\nImage Style Analysis:\n{state.image_analysis}"
+    return {
+        "requirement_analysis": combine_analyses(analysis, state.image_analysis),
+        "current_stage": "analyzed",
+    }
+
+
+async def analyze_parallel(state: ShaderGenState) -> dict[str, Any]:
+    """
+    Analyze the reference image and the user requirement concurrently.
+
+    The text analysis does not wait for the vision call; both results are
+    combined afterwards, so the image path costs one LLM round trip instead
+    of two.
+    """
+    image_update, requirement_update = await asyncio.gather(
+        analyze_image(state), analyze_requirement(state)
+    )
 
     return {
-        "requirement_analysis": combined_analysis,
+        **image_update,
+        "requirement_analysis": combine_analyses(
+            requirement_update["requirement_analysis"],
+            image_update["image_analysis"],
+        ),
         "current_stage": "analyzed",
     }
 
@@ -150,74 +309,26 @@ async def generate_shader(state: ShaderGenState) -> dict[str, Any]:
 
     # Choose system prompt based on whether this is a modification
     if state.is_modification and state.previous_code:
-        system_prompt = """You are an expert Unity shader programmer specializing in URP (Universal Render Pipeline).
-You are MODIFYING an existing shader based on the user's request.
-
-CRITICAL RULES:
-1. Preserve the overall structure of the existing shader
-2. Only change what the user specifically requests
-3. Keep all existing properties unless explicitly asked to remove
-4. Maintain URP compatibility
-5. Keep the shader working and compilable
-
-Respond with ONLY the complete modified shader code. No explanations before or after."""
+        system_message = _SYS_GEN_MOD
     else:
-        system_prompt = """You are an expert Unity shader programmer specializing in URP (Universal Render Pipeline).
-Generate a complete, valid HLSL shader for Unity URP based on the requirements.
-
-CRITICAL RULES:
-1. Use URP shader structure with proper includes
-2. Include all necessary pragmas (#pragma vertex, #pragma fragment)
-3. Use HLSL syntax, not CG
-4. Include proper CBUFFER for material properties
-5. Use TEXTURE2D and SAMPLER macros for textures
-6. Include proper Tags for URP compatibility
+        system_message = _SYS_GEN_NEW
 
-Shader Structure Template:
-```hlsl
-Shader "Custom/ShaderName"
-{
-    Properties
-    {
-        // Exposed properties
-    }
-    SubShader
-    {
-        Tags { "RenderType"="Opaque" "RenderPipeline"="UniversalPipeline" }
-        
-        Pass
-        {
-            HLSLPROGRAM
-            #pragma vertex vert
-            #pragma fragment frag
-            
-            #include "Packages/com.unity.render-pipelines.universal/ShaderLibrary/Core.hlsl"
-            
-            // Structs, CBUFFER, functions
-            ENDHLSL
-        }
-    }
-}
-```
-
-Respond with ONLY the complete shader code. No explanations before or after."""
-
-    # Build the request
-    user_content = f"Requirement: {state.user_requirement}"
-
-    # Include conversation context if available
+    # Build the request from sections joined once at the end
     if state.conversation_context:
-        user_content = f"Conversation context:\n{state.conversation_context}\n\nCurrent request: {state.user_requirement}"
+        parts = [
+            f"Conversation context:\n{state.conversation_context}",
+            f"Current request: {state.user_requirement}",
+        ]
+    else:
+        parts = [f"Requirement: {state.user_requirement}"]
 
     # Include previous code for modifications
     if state.is_modification and state.previous_code:
-        user_content += (
-            f"\n\nExisting shader to modify:\n```hlsl\n{state.previous_code}\n```"
-        )
+        parts.append(f"Existing shader to modify:\n```hlsl\n{state.previous_code}\n```")
 
     # Include requirement analysis (may contain image analysis if available)
     if state.requirement_analysis:
-        user_content += f"\n\nAnalysis:\n{state.requirement_analysis}"
+        parts.append(f"Analysis:\n{state.requirement_analysis}")
 
     # If retrying, include error information
     if (
@@ -225,19 +336,21 @@ Respond with ONLY the complete shader code. No explanations before or after."""
         and state.compile_result.status == CompileStatus.FAILED
         and state.retry_count > 0
     ):
-        user_content += f"\n\nPrevious code had compilation errors:\n"
-        user_content += "\n".join(e.message for e in state.compile_result.errors)
-        user_content += "\n\nPlease fix these errors in the new version."
+        errors = format_compile_errors(state.compile_result.errors)
+        parts.append(f"Previous code had compilation errors:\n{errors}")
+        parts.append("Please fix these errors in the new version.")
 
         if state.generated_code:
-            user_content += f"\n\nPrevious code:\n```hlsl\n{state.generated_code}\n```"
+            parts.append(f"Previous code:\n```hlsl\n{state.generated_code}\n```")
+
+    user_content = "\n\n".join(parts)
 
     messages = [
-        SystemMessage(content=system_prompt),
+        system_message,
         HumanMessage(content=user_content),
     ]
 
-    shader_code = await model_manager.generate(messages, ModelRole.CODE)
+    shader_code = await generate_code(model_manager, messages)
 
     # Extract code from markdown code block if present
     shader_code = extract_shader_code(shader_code)
@@ -256,40 +369,8 @@ async def validate_shader(state: ShaderGenState) -> dict[str, Any]:
     """
     code = state.generated_code or ""
 
-    validation_errors: list[str] = []
-
-    # Check for required elements
-    if 'Shader "' not in code and 'Shader "' not in code:
-        validation_errors.append("Missing Shader declaration")
-
-    if "SubShader" not in code:
-        validation_errors.append("Missing SubShader block")
-
-    if "Pass" not in code:
-        validation_errors.append("Missing Pass block")
-
-    if "#pragma vertex" not in code:
-        validation_errors.append("Missing #pragma vertex directive")
-
-    if "#pragma fragment" not in code:
-        validation_errors.append("Missing #pragma fragment directive")
-
-    # Check for URP includes
-    if "com.unity.render-pipelines" not in code:
-        validation_errors.append(
-            "Missing URP include (Packages/com.unity.render-pipelines.universal/...)"
-        )
-
-    # Check for HLSLPROGRAM block
-    if "HLSLPROGRAM" not in code:
-        validation_errors.append(
-            "Missing HLSLPROGRAM block (using CGPROGRAM instead of HLSL?)"
-        )
-
-    if "ENDHLSL" not in code:
-        validation_errors.append("Missing ENDHLSL")
-
-    is_valid = len(validation_errors) == 0
+    validation_errors = [message for marker, message in _MARKERS if marker not in code]
+    is_valid = not validation_errors
 
     return {
         "validation_passed": is_valid,
@@ -313,31 +394,17 @@ async def fix_validation_errors(state: ShaderGenState) -> dict[str, Any]:
     """
     model_manager = get_model_manager()
 
-    fix_prompt = """You are a shader debugging expert. Fix the following validation errors in the shader code.
-
-Validation Errors:
-{errors}
-
-Current Shader Code:
-```hlsl
-{code}
-```
-
-Provide the COMPLETE fixed shader code. Ensure all validation issues are resolved."""
-
-    prompt = fix_prompt.format(
+    prompt = _FIX_PROMPT.format(
         errors="\n".join(f"- {e}" for e in (state.validation_errors or [])),
         code=state.generated_code or "",
     )
 
     messages = [
-        SystemMessage(
-            content="Fix the shader validation errors. Output only the corrected shader code."
-        ),
+        _SYS_FIX,
         HumanMessage(content=prompt),
     ]
 
-    fixed_code = await model_manager.generate(messages, ModelRole.CODE)
+    fixed_code = await generate_code(model_manager, messages)
     fixed_code = extract_shader_code(fixed_code)
 
     return {
@@ -346,7 +413,29 @@ Provide the COMPLETE fixed shader code. Ensure all validation issues are resolve
     }
 
 
-def handle_compile_result(state: ShaderGenState) -> dict[str, Any]:
+async def request_compile(state: ShaderGenState) -> dict[str, Any]:
+    """
+    Pause the graph until Unity has compiled the validated shader.
+
+    The interrupt payload carries the compile_shader tool arguments; the
+    host resumes the graph with the tool's result.
+    """
+    result = interrupt(
+        {
+            "code": state.generated_code,
+            "shader_name": extract_shader_name(state.generated_code),
+        }
+    )
+    if isinstance(result, dict):
+        result = CompileResult.from_dict(result)
+
+    return {
+        "compile_result": result,
+        "current_stage": "compiling",
+    }
+
+
+async def handle_compile_result(state: ShaderGenState) -> dict[str, Any]:
     """
     Process compilation result from Unity tool call.
 
@@ -403,7 +492,9 @@ async def finalize_failure(state: ShaderGenState) -> dict[str, Any]:
     error_summary = "Shader generation failed after maximum retry attempts."
 
     if state.compile_result and state.compile_result.errors:
-        error_summary += "\n\nFinal errors:\n" + "\n".join(state.compile_result.errors)
+        error_summary += "\n\nFinal errors:\n" + format_compile_errors(
+            state.compile_result.errors
+        )
 
     return {
         "is_complete": True,
@@ -417,41 +508,110 @@ async def finalize_failure(state: ShaderGenState) -> dict[str, Any]:
 # =============================================================================
 
 
-def extract_shader_code(response: str) -> str:
+def format_compile_errors(errors: list[CompileError]) -> str:
+    """Format compile errors one per line with their line numbers."""
+    return "\n".join(f"line {e.line}: {e.message}" for e in errors)
+
+
+def extract_shader_name(code: str) -> str:
+    """Extract the shader name from its declaration."""
+    match = _SHADER_NAME_RE.search(code)
+    return match.group(1) if match else "Generated/Shader"
+
+
+def _image_cache_key(state: ShaderGenState) -> str:
+    """Digest of the reference image and the requirement sent along with it."""
+    if state.reference_image:
+        data = state.reference_image
+    else:
+        data = (state.reference_image_b64 or state.image_url_cache).encode()
+    digest = hashlib.blake2b(data, digest_size=16)
+    # The vision prompt quotes the requirement, so it is part of the key
+    digest.update(state.user_requirement.encode())
+    return digest.hexdigest()
+
+
+async def generate_code(model_manager: ModelManager, messages: list) -> str:
     """
-    Extract shader code from LLM response.
+    Generate code with the code model, streaming the response.
 
-    Handles markdown code blocks and raw code.
+    Streaming stops as soon as the first fenced code block is closed, since
+    anything after it is discarded by extract_shader_code anyway. Falls back
+    to a regular generate call if the model can't stream or yields nothing;
+    other streaming errors propagate like generate's would.
     """
-    # Check for markdown code block
-    if "```" in response:
-        # Find code block
-        lines = response.split("\n")
-        in_code_block = False
-        code_lines = []
+    chunks: list[str] = []
+    fences = _FenceTracker()
+    try:
+        async with aclosing(model_manager.stream(messages, ModelRole.CODE)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if fences.feed(chunk):
+                    break
+    except NotImplementedError:
+        if chunks:
+            raise
+
+    if chunks:
+        return "".join(chunks)
+
+    return await model_manager.generate(messages, ModelRole.CODE)
 
+
+class _FenceTracker:
+    """
+    Finds the end of the first fenced block in streamed text.
+
+    Matches the fence lines of _CODE_FENCE_RE, but only looks at each chunk
+    and the current unfinished line, so a long response is scanned once.
+    """
+
+    __slots__ = ("_fences", "_line")
+
+    def __init__(self) -> None:
+        self._fences = 0
+        self._line = ""
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk; returns True once the first fenced block is closed."""
+        *lines, self._line = (self._line + chunk).split("\n")
         for line in lines:
-            if line.strip().startswith("```"):
-                if in_code_block:
-                    break  # End of code block
-                else:
-                    in_code_block = True
-                    continue  # Skip the opening ```
+            if line.lstrip().startswith("```"):
+                self._fences += 1
+                if self._fences == 2:
+                    return True
+        # The closing fence needs no newline after it
+        return self._fences == 1 and self._line.lstrip().startswith("```")
+
+
+def combine_analyses(requirement_analysis: str, image_analysis: Optional[str]) -> str:
+    """Combine requirement and image analyses for the generation stage."""
+    if not image_analysis:
+        return requirement_analysis
+    return (
+        f"User Requirement Analysis:\n{requirement_analysis}"
+        f"\n\nImage Style Analysis:\n{image_analysis}"
+    )
 
-            if in_code_block:
-                code_lines.append(line)
 
-        if code_lines:
-            return "\n".join(code_lines)
+def extract_shader_code(response: str) -> str:
+    """
+    Extract shader code from LLM response.
+
+    Handles markdown code blocks and raw code.
+    """
+    # Check for markdown code block
+    match = _CODE_FENCE_RE.search(response)
+    if match:
+        code, closed = match.groups()
+        if not closed:
+            return code
+        if code:
+            return code[:-1]
 
     # No code block found, return as-is but try to find Shader declaration
-    if 'Shader "' in response or 'Shader "' in response:
-        # Find the start of the shader
-        start_idx = response.find('Shader "')
-        if start_idx == -1:
-            start_idx = response.find('Shader "')
-
-        if start_idx != -1:
-            return response[start_idx:].strip()
+    start_idx = response.find('Shader "')
+    if start_idx != -1:
+        return response[start_idx:].strip()
 
     return response.strip()
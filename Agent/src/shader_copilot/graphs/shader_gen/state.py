@@ -4,14 +4,12 @@ Shader generation graph state.
 Defines the state specific to the shader generation workflow.
 """
 
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field
-
 
 class CompileStatus(str, Enum):
     """Status of shader compilation."""
@@ -22,7 +20,8 @@ class CompileStatus(str, Enum):
     FAILED = "failed"
 
 
-class CompileError(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class CompileError:
     """A single shader compilation error."""
 
     line: int
@@ -30,18 +29,46 @@ class CompileError(BaseModel):
     message: str
     severity: str = "error"  # error, warning
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "CompileError":
+        """Create from a tool response dictionary."""
+        return cls(
+            line=data.get("line", 0),
+            column=data.get("column", 0),
+            message=data.get("message", ""),
+            severity=data.get("severity", "error"),
+        )
+
 
-class CompileResult(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class CompileResult:
     """Result of shader compilation."""
 
     status: CompileStatus = CompileStatus.PENDING
     shader_id: Optional[str] = None
-    errors: list[CompileError] = Field(default_factory=list)
-    warnings: list[CompileError] = Field(default_factory=list)
+    errors: list[CompileError] = field(default_factory=list)
+    warnings: list[CompileError] = field(default_factory=list)
     compile_time_ms: Optional[float] = None
 
-
-class TextureSlot(BaseModel):
+    @property
+    def success(self) -> bool:
+        """Check if compilation succeeded."""
+        return self.status == CompileStatus.SUCCESS
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CompileResult":
+        """Create from a dictionary, rebuilding nested errors explicitly."""
+        return cls(
+            status=CompileStatus(data.get("status", CompileStatus.PENDING)),
+            shader_id=data.get("shader_id"),
+            errors=[CompileError.from_dict(e) for e in data.get("errors", [])],
+            warnings=[CompileError.from_dict(w) for w in data.get("warnings", [])],
+            compile_time_ms=data.get("compile_time_ms"),
+        )
+
+
+@dataclass(slots=True, kw_only=True)
+class TextureSlot:
     """A texture slot required by the shader."""
 
     name: str  # e.g., "_MainTex", "_NormalMap"
@@ -50,7 +77,8 @@ class TextureSlot(BaseModel):
     required: bool = True
 
 
-class ShaderGenState(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ShaderGenState:
     """
     State for the shader generation graph.
 
@@ -58,14 +86,16 @@ class ShaderGenState(BaseModel):
     """
 
     # Task identity
-    task_id: UUID = Field(default_factory=uuid4)
+    task_id: UUID = field(default_factory=uuid4)
     session_id: str = ""
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: float = field(default_factory=time.time)
 
     # User input
     user_requirement: str = ""
     reference_image: Optional[bytes] = None
+    reference_image_b64: Optional[str] = None  # Original payload if sent encoded
     reference_image_mime: Optional[str] = None
+    image_url_cache: Optional[str] = None  # Image URL sent to the vision model
 
     # Context for modifications
     previous_code: Optional[str] = None  # Existing shader to modify
@@ -79,28 +109,28 @@ class ShaderGenState(BaseModel):
     # Generation results
     shader_name: str = ""
     generated_code: str = ""
-    shader_properties: dict = Field(default_factory=dict)
+    shader_properties: dict = field(default_factory=dict)
 
     # Validation
     validation_passed: bool = False
-    validation_errors: list[str] = Field(default_factory=list)
+    validation_errors: list[str] = field(default_factory=list)
 
     # Compilation
-    compile_result: CompileResult = Field(default_factory=CompileResult)
+    compile_result: CompileResult = field(default_factory=CompileResult)
 
     # Material and preview
     material_id: Optional[str] = None
-    material_properties: dict = Field(default_factory=dict)
+    material_properties: dict = field(default_factory=dict)
     preview_object: str = "Sphere"
     screenshot: Optional[bytes] = None
 
     # Retry tracking
     retry_count: int = 0
     max_retries: int = 3
-    error_history: list[str] = Field(default_factory=list)
+    error_history: list[str] = field(default_factory=list)
 
     # Texture requirements (for future texture generation)
-    pending_textures: list[TextureSlot] = Field(default_factory=list)
+    pending_textures: list[TextureSlot] = field(default_factory=list)
 
     # Output
     saved_shader_path: Optional[str] = None
@@ -111,6 +141,13 @@ class ShaderGenState(BaseModel):
     is_complete: bool = False
     error: Optional[str] = None
 
+    @property
+    def has_reference_image(self) -> bool:
+        """Check if a reference image was provided in either form."""
+        return bool(
+            self.reference_image or self.reference_image_b64 or self.image_url_cache
+        )
+
     @property
     def can_retry(self) -> bool:
         """Check if retry is allowed."""
@@ -5,13 +5,16 @@ Provides configuration management for LLM API access.
 """
 
 import logging
+import logging.handlers
 import os
 import sys
 from functools import lru_cache
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import BaseModel, Field
-from pydantic_settings import BaseSettings
+from dotenv import dotenv_values
+from pydantic import BaseModel, Field, model_validator
+
+ENV_FILE = ".env"
 
 
 class ModelSettings(BaseModel):
@@ -22,11 +25,27 @@ class ModelSettings(BaseModel):
     vl_model: str = "qwen-vl-plus"
 
 
-class LLMConfig(BaseSettings):
+class _EnvConfig(BaseModel):
+    """
+    Base for configuration read from the environment and the .env file.
+
+    Field aliases name the variables, matched case-insensitively. Values
+    passed to the constructor take precedence over both sources.
+    """
+
+    @model_validator(mode="before")
+    @classmethod
+    def _read_env(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            return {**_settings_from_env(cls), **data}
+        return data
+
+
+class LLMConfig(_EnvConfig):
     """
     LLM configuration loaded from environment variables.
 
-    Supports .env file loading via pydantic-settings.
+    Supports .env file loading.
     """
 
     # API Configuration
@@ -53,8 +72,6 @@ class LLMConfig(BaseSettings):
     max_retry_count: int = Field(default=3, alias="MAX_RETRY_COUNT")
 
     class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
         extra = "ignore"
 
     @property
@@ -71,15 +88,13 @@ class LLMConfig(BaseSettings):
         )
 
 
-class ServerConfig(BaseSettings):
+class ServerConfig(_EnvConfig):
     """WebSocket server configuration."""
 
     host: str = Field(default="localhost", alias="WEBSOCKET_HOST")
     port: int = Field(default=8765, alias="WEBSOCKET_PORT")
 
     class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
         extra = "ignore"
 
     @property
@@ -88,18 +103,39 @@ class ServerConfig(BaseSettings):
         return f"ws://{self.host}:{self.port}"
 
 
-class LogConfig(BaseSettings):
+class LogConfig(_EnvConfig):
     """Logging configuration."""
 
     level: str = Field(default="INFO", alias="LOG_LEVEL")
     file: Optional[str] = Field(default=None, alias="LOG_FILE")
 
     class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
         extra = "ignore"
 
 
+@lru_cache(maxsize=1)
+def _load_env_file() -> dict[str, str]:
+    """Read the .env file once; all config classes share the result."""
+    path = os.path.abspath(ENV_FILE)
+    if not os.path.exists(path):
+        return {}
+    values = dotenv_values(path, encoding="utf-8")
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def _settings_from_env(model: type[BaseModel]) -> dict[str, str]:
+    """Collect aliased field values, environment variables taking precedence."""
+    env_file = {key.lower(): value for key, value in _load_env_file().items()}
+    environ = {key.lower(): value for key, value in os.environ.items()}
+    values = {}
+    for name, field in model.model_fields.items():
+        key = field.alias or name
+        value = environ.get(key.lower(), env_file.get(key.lower()))
+        if value is not None:
+            values[key] = value
+    return values
+
+
 @lru_cache()
 def get_llm_config() -> LLMConfig:
     """Get cached LLM configuration."""
@@ -120,29 +156,44 @@ def get_log_config() -> LogConfig:
 
 def reload_config() -> None:
     """Clear config cache to reload from environment."""
+    _load_env_file.cache_clear()
     get_llm_config.cache_clear()
     get_server_config.cache_clear()
     get_log_config.cache_clear()
 
 
+_LOG_FORMATTER = logging.Formatter(
+    fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+# Records buffered before the log file is written
+_LOG_BUFFER_CAPACITY = 32
+
+# (level, file) the root logger was last configured for
+_configured_for: Optional[tuple[str, Optional[str]]] = None
+
+
 def setup_logging(config: Optional[LogConfig] = None) -> None:
     """
     Configure logging for the application.
 
+    Repeated calls with the same level and file are no-ops.
+
     Args:
         config: Optional log configuration. If None, loads from environment.
     """
+    global _configured_for
+
     if config is None:
         config = get_log_config()
 
-    # Parse log level
-    level = getattr(logging, config.level.upper(), logging.INFO)
+    key = (config.level.upper(), config.file)
+    if key == _configured_for:
+        return
 
-    # Create formatter
-    formatter = logging.Formatter(
-        fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    # Parse log level
+    level = getattr(logging, key[0], logging.INFO)
 
     # Configure root logger
     root_logger = logging.getLogger()
@@ -151,20 +202,33 @@ def setup_logging(config: Optional[LogConfig] = None) -> None:
     # Remove existing handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+        # MemoryHandler.close() flushes and then drops its target
+        target = getattr(handler, "target", None)
+        handler.close()
+        if isinstance(handler, logging.handlers.MemoryHandler) and target:
+            target.close()
 
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(_LOG_FORMATTER)
     root_logger.addHandler(console_handler)
 
-    # File handler if configured
+    # File handler if configured; records are buffered in small batches,
+    # flushing immediately on warnings and errors so they are never held
+    # back. logging.shutdown() flushes the buffer at exit.
     if config.file:
         try:
             file_handler = logging.FileHandler(config.file, encoding="utf-8")
             file_handler.setLevel(level)
-            file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
+            file_handler.setFormatter(_LOG_FORMATTER)
+            buffered_handler = logging.handlers.MemoryHandler(
+                capacity=_LOG_BUFFER_CAPACITY,
+                flushLevel=logging.WARNING,
+                target=file_handler,
+            )
+            buffered_handler.setLevel(level)
+            root_logger.addHandler(buffered_handler)
         except IOError as e:
             logging.warning(f"Could not create log file {config.file}: {e}")
 
@@ -173,4 +237,5 @@ def setup_logging(config: Optional[LogConfig] = None) -> None:
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("websockets").setLevel(logging.WARNING)
 
+    _configured_for = key
     logging.info(f"Logging configured at level {config.level}")
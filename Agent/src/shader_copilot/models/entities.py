@@ -5,12 +5,39 @@ Defines the core entities used throughout the system.
 See: data-model.md for full specification.
 """
 
+import os
+import sys
 from datetime import datetime
 from enum import Enum
-from typing import Optional
-from uuid import UUID, uuid4
-
-from pydantic import BaseModel, Field
+from typing import Any, Optional
+from uuid import UUID
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    TypeAdapter,
+    field_validator,
+)
+
+# Random bytes for new ids, read from os.urandom in blocks so one syscall
+# serves 256 UUIDs. list.pop is atomic, so concurrent callers never share
+# a slice; a forked child must not reuse the parent's pool.
+_UUID_POOL: list[bytes] = []
+_UUID_POOL_BLOCK = 4096
+os.register_at_fork(after_in_child=_UUID_POOL.clear)
+
+
+def new_uuid() -> UUID:
+    """Generate a random (version 4) UUID from the pooled entropy."""
+    try:
+        raw = _UUID_POOL.pop()
+    except IndexError:
+        block = os.urandom(_UUID_POOL_BLOCK)
+        _UUID_POOL.extend(block[i : i + 16] for i in range(16, _UUID_POOL_BLOCK, 16))
+        raw = block[:16]
+    return UUID(bytes=raw, version=4)
 
 
 # =============================================================================
@@ -68,7 +95,10 @@ class BackgroundType(str, Enum):
 class ImageData(BaseModel):
     """Image data attached to a message."""
 
-    image_id: str = Field(default_factory=lambda: str(uuid4()))
+    # Raw bytes travel as base64 so JSON round-trips through the adapters
+    model_config = ConfigDict(frozen=True, ser_json_bytes="base64", val_json_bytes="base64")
+
+    image_id: str = Field(default_factory=lambda: str(new_uuid()))
     data: bytes
     mime_type: str = "image/png"
 
@@ -76,6 +106,8 @@ class ImageData(BaseModel):
 class ModelConfig(BaseModel):
     """Configuration for LLM models."""
 
+    model_config = ConfigDict(frozen=True)
+
     router_model: str = "qwen-turbo"
     code_model: str = "qwen-max"
     vl_model: str = "qwen-vl-plus"
@@ -84,14 +116,19 @@ class ModelConfig(BaseModel):
 class SessionConfig(BaseModel):
     """Configuration for a session."""
 
+    # "model_config" is reserved by pydantic, so the field is aliased
+    model_config = ConfigDict(frozen=True, populate_by_name=True, serialize_by_alias=True)
+
     output_directory: str = "Assets/Shaders/Generated"
     max_retry_count: int = 3
-    model_config: ModelConfig = Field(default_factory=ModelConfig)
+    models: ModelConfig = Field(default=ModelConfig(), alias="model_config")
 
 
 class CameraSettings(BaseModel):
     """Camera settings for preview scene."""
 
+    model_config = ConfigDict(frozen=True)
+
     distance: float = 3.0
     rotation_x: float = 15.0
     rotation_y: float = -30.0
@@ -101,10 +138,13 @@ class CameraSettings(BaseModel):
 class PreviewConfig(BaseModel):
     """Preview scene configuration."""
 
+    model_config = ConfigDict(frozen=True)
+
     object_type: PreviewObjectType = PreviewObjectType.SPHERE
     background_type: BackgroundType = BackgroundType.SOLID
     background_color: str = "#303030"  # Hex color
-    camera_settings: CameraSettings = Field(default_factory=CameraSettings)
+    # Frozen defaults are shared rather than rebuilt per instance
+    camera_settings: CameraSettings = CameraSettings()
 
 
 # =============================================================================
@@ -112,17 +152,31 @@ class PreviewConfig(BaseModel):
 # =============================================================================
 
 
+def _preview_text(content: str) -> str:
+    """Truncate a message for session listings."""
+    return content[:100] + ("..." if len(content) > 100 else "")
+
+
+def _intern_paths(cls, value: Any) -> Any:
+    """Intern asset paths; the same few paths recur across a session."""
+    if isinstance(value, (list, tuple)):
+        return tuple(sys.intern(path) if isinstance(path, str) else path for path in value)
+    return value
+
+
 class Message(BaseModel):
     """A single message in the conversation."""
 
-    message_id: UUID = Field(default_factory=uuid4)
+    message_id: UUID = Field(default_factory=new_uuid)
     role: MessageRole
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    images: list[dict] = Field(default_factory=list)  # Serialized ImageData
-    artifacts: list[str] = Field(default_factory=list)  # Asset paths
+    images: tuple[ImageData, ...] = ()
+    artifacts: tuple[str, ...] = ()  # Asset paths
     metadata: dict = Field(default_factory=dict)
 
+    _intern_artifacts = field_validator("artifacts", mode="before")(_intern_paths)
+
 
 class Session(BaseModel):
     """
@@ -131,22 +185,48 @@ class Session(BaseModel):
     Represents a complete interaction session with conversation history.
     """
 
-    session_id: UUID = Field(default_factory=uuid4)
+    session_id: UUID = Field(default_factory=new_uuid)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     status: SessionStatus = SessionStatus.ACTIVE
-    config: SessionConfig = Field(default_factory=SessionConfig)
+    config: SessionConfig = SessionConfig()  # Frozen, shared default
     messages: list[Message] = Field(default_factory=list)
 
     # Associated assets
-    shader_assets: list[str] = Field(default_factory=list)  # Paths
-    material_assets: list[str] = Field(default_factory=list)  # Paths
+    shader_assets: tuple[str, ...] = ()  # Paths
+    material_assets: tuple[str, ...] = ()  # Paths
+
+    _intern_assets = field_validator("shader_assets", "material_assets", mode="before")(
+        _intern_paths
+    )
+
+    # Preview of the first user message, kept up to date by add_message
+    _preview_cache: Optional[str] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        """Seed the preview cache from loaded messages."""
+        for msg in self.messages:
+            if msg.role == MessageRole.USER:
+                self._preview_cache = _preview_text(msg.content)
+                break
+
+    @property
+    def preview_message(self) -> str:
+        """First user message, truncated for listings."""
+        return self._preview_cache or ""
 
     def add_message(self, role: MessageRole, content: str, **kwargs) -> Message:
         """Add a new message to the session."""
+        # Validated construction is deliberate: model_construct runs a
+        # Python-level loop over fields (and inspects every default_factory)
+        # and benchmarks slower than pydantic-core validation for this model
+        now = datetime.utcnow()
+        kwargs.setdefault("timestamp", now)
         message = Message(role=role, content=content, **kwargs)
         self.messages.append(message)
-        self.updated_at = datetime.utcnow()
+        self.updated_at = now
+        if role == MessageRole.USER and self._preview_cache is None:
+            self._preview_cache = _preview_text(content)
         return message
 
 
@@ -157,7 +237,7 @@ class ShaderAsset(BaseModel):
     Represents a shader file with its metadata and compilation status.
     """
 
-    asset_id: UUID = Field(default_factory=uuid4)
+    asset_id: UUID = Field(default_factory=new_uuid)
     shader_name: str
     code: str
     compile_status: CompileStatus = CompileStatus.PENDING
@@ -180,7 +260,7 @@ class MaterialAsset(BaseModel):
     Represents a material file with its shader reference and properties.
     """
 
-    asset_id: UUID = Field(default_factory=uuid4)
+    asset_id: UUID = Field(default_factory=new_uuid)
     material_name: str
     shader_ref: str  # Shader name or path
     properties: dict = Field(default_factory=dict)  # Property name → value
@@ -210,34 +290,61 @@ class SessionSummary(BaseModel):
 class SessionIndex(BaseModel):
     """Index of all sessions for quick lookup."""
 
-    sessions: list[SessionSummary] = Field(default_factory=list)
+    sessions: list[SessionSummary] = Field(default_factory=list)  # Most recent first
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
+    # session_id -> entry of sessions, so upserts don't scan the summaries
+    _by_id: dict[UUID, SessionSummary] = PrivateAttr(default_factory=dict)
+    # The list _by_id was built from; see _index
+    _indexed: Optional[list[SessionSummary]] = PrivateAttr(default=None)
+
+    def _index(self) -> dict[UUID, SessionSummary]:
+        """Map of session_id to summary, rebuilt if sessions was replaced or edited."""
+        if self._indexed is not self.sessions or len(self._by_id) != len(self.sessions):
+            self._by_id = {s.session_id: s for s in self.sessions}
+            self._indexed = self.sessions
+        return self._by_id
+
+    def _drop(self, session_id: UUID) -> None:
+        """Remove a session's entry, if any, from the list and the index."""
+        existing = self._index().pop(session_id, None)
+        if existing is not None:
+            # Identity is checked first, so this is a pointer scan and a move
+            self.sessions.remove(existing)
+
     def add_session(self, session: Session) -> None:
         """Add or update a session in the index."""
-        # Remove existing entry if present
-        self.sessions = [s for s in self.sessions if s.session_id != session.session_id]
-
-        # Get preview message
-        preview = ""
-        for msg in session.messages:
-            if msg.role == MessageRole.USER:
-                preview = msg.content[:100] + ("..." if len(msg.content) > 100 else "")
-                break
-
-        # Add new entry
+        # Replace any existing entry and move it to the front
         summary = SessionSummary(
             session_id=session.session_id,
             created_at=session.created_at,
             updated_at=session.updated_at,
             status=session.status,
             message_count=len(session.messages),
-            preview_message=preview,
+            preview_message=session.preview_message,
         )
-        self.sessions.insert(0, summary)  # Most recent first
+        self._drop(session.session_id)
+        self.sessions.insert(0, summary)
+        self._by_id[session.session_id] = summary
         self.last_updated = datetime.utcnow()
 
     def remove_session(self, session_id: UUID) -> None:
         """Remove a session from the index."""
-        self.sessions = [s for s in self.sessions if s.session_id != session_id]
+        self._drop(session_id)
         self.last_updated = datetime.utcnow()
+
+
+# =============================================================================
+# Type Adapters
+# =============================================================================
+
+# Built once at import so (de)serialization never rebuilds a validator.
+# validate_json parses bytes straight into models without an interim dict.
+ImageDataAdapter = TypeAdapter(ImageData)
+MessageAdapter = TypeAdapter(Message)
+SessionAdapter = TypeAdapter(Session)
+ShaderAssetAdapter = TypeAdapter(ShaderAsset)
+MaterialAssetAdapter = TypeAdapter(MaterialAsset)
+SessionSummaryAdapter = TypeAdapter(SessionSummary)
+SessionSummaryListAdapter = TypeAdapter(list[SessionSummary])
+SessionIndexAdapter = TypeAdapter(SessionIndex)
@@ -11,6 +11,32 @@ from langchain_openai import ChatOpenAI
 
 from shader_copilot.models.config import get_llm_config
 
+# System prompts are constant, so the messages are built once and shared
+_SYS_CLASSIFY = SystemMessage(
+    content="""You are an intent classifier for a shader generation assistant.
+Classify the user's message into one of these intents:
+- GENERATE_SHADER: User wants to create a new shader
+- MODIFY_SHADER: User wants to modify an existing shader
+- EXPLAIN_SHADER: User wants explanation about shaders
+- QUESTION: User has a general question
+- OTHER: None of the above
+
+Respond with ONLY the intent name, nothing else."""
+)
+
+_SYS_GENERATE_SHADER = SystemMessage(
+    content="""You are an expert Unity shader programmer.
+Generate valid HLSL shader code for Unity's Universal Render Pipeline (URP).
+Your response should contain ONLY the shader code, wrapped in a code block.
+The shader must be syntactically correct and ready to compile.
+
+Guidelines:
+- Use URP shader structure with proper includes
+- Follow Unity shader naming conventions
+- Include appropriate properties for customization
+- Handle common edge cases gracefully"""
+)
+
 
 class ModelRole(str, Enum):
     """Role-based model selection."""
@@ -29,6 +55,26 @@ class ModelManager:
     - vl_model: Vision-language model for image analysis
     """
 
+    # Role -> model attribute
+    _ROLE_MAP = {
+        ModelRole.ROUTER: "router",
+        ModelRole.CODE: "coder",
+        ModelRole.VISION: "vision",
+    }
+
+    # Role -> model name attribute
+    _ROLE_NAME_ATTRS = {
+        ModelRole.ROUTER: "_router_model_name",
+        ModelRole.CODE: "_code_model_name",
+        ModelRole.VISION: "_vl_model_name",
+    }
+
+    _TEMPERATURES = {
+        ModelRole.ROUTER: 0.0,  # Deterministic for classification
+        ModelRole.CODE: 0.3,  # Low temperature for code
+        ModelRole.VISION: 0.5,
+    }
+
     def __init__(
         self,
         router_model: str | None = None,
@@ -50,16 +96,17 @@ class ModelManager:
         config = get_llm_config()
 
         self._api_key = api_key or config.api_key
-        self._base_url = base_url or config.base_url
+        self._base_url = base_url or config.api_base
 
         self._router_model_name = router_model or config.router_model
         self._code_model_name = code_model or config.code_model
         self._vl_model_name = vl_model or config.vl_model
 
-        # Lazy initialization of models
-        self._router_model: ChatOpenAI | None = None
-        self._code_model: ChatOpenAI | None = None
-        self._vl_model: ChatOpenAI | None = None
+        # Models are created once up front; update_model replaces them
+        temperatures = self._TEMPERATURES
+        self.router = self._create_model(self._router_model_name, temperatures[ModelRole.ROUTER])
+        self.coder = self._create_model(self._code_model_name, temperatures[ModelRole.CODE])
+        self.vision = self._create_model(self._vl_model_name, temperatures[ModelRole.VISION])
 
     def _create_model(self, model_name: str, temperature: float = 0.7) -> ChatOpenAI:
         """Create a ChatOpenAI model instance."""
@@ -70,42 +117,13 @@ class ModelManager:
             temperature=temperature,
         )
 
-    @property
-    def router(self) -> ChatOpenAI:
-        """Get the router model for intent classification."""
-        if self._router_model is None:
-            self._router_model = self._create_model(
-                self._router_model_name,
-                temperature=0.0,  # Deterministic for classification
-            )
-        return self._router_model
-
-    @property
-    def coder(self) -> ChatOpenAI:
-        """Get the code generation model."""
-        if self._code_model is None:
-            self._code_model = self._create_model(
-                self._code_model_name, temperature=0.3  # Low temperature for code
-            )
-        return self._code_model
-
-    @property
-    def vision(self) -> ChatOpenAI:
-        """Get the vision-language model."""
-        if self._vl_model is None:
-            self._vl_model = self._create_model(self._vl_model_name, temperature=0.5)
-        return self._vl_model
-
     def get_model(self, role: ModelRole) -> ChatOpenAI:
         """Get model by role."""
-        if role == ModelRole.ROUTER:
-            return self.router
-        elif role == ModelRole.CODE:
-            return self.coder
-        elif role == ModelRole.VISION:
-            return self.vision
-        else:
-            raise ValueError(f"Unknown model role: {role}")
+        try:
+            attr = self._ROLE_MAP[role]
+        except KeyError:
+            raise ValueError(f"Unknown model role: {role}") from None
+        return getattr(self, attr)
 
     async def generate(
         self,
@@ -156,18 +174,8 @@ class ModelManager:
         Returns:
             Classified intent string
         """
-        system_prompt = """You are an intent classifier for a shader generation assistant.
-Classify the user's message into one of these intents:
-- GENERATE_SHADER: User wants to create a new shader
-- MODIFY_SHADER: User wants to modify an existing shader
-- EXPLAIN_SHADER: User wants explanation about shaders
-- QUESTION: User has a general question
-- OTHER: None of the above
-
-Respond with ONLY the intent name, nothing else."""
-
         messages = [
-            SystemMessage(content=system_prompt),
+            _SYS_CLASSIFY,
             HumanMessage(content=user_message),
         ]
 
@@ -191,17 +199,6 @@ Respond with ONLY the intent name, nothing else."""
         Returns:
             Generated shader code
         """
-        system_prompt = """You are an expert Unity shader programmer.
-Generate valid HLSL shader code for Unity's Universal Render Pipeline (URP).
-Your response should contain ONLY the shader code, wrapped in a code block.
-The shader must be syntactically correct and ready to compile.
-
-Guidelines:
-- Use URP shader structure with proper includes
-- Follow Unity shader naming conventions
-- Include appropriate properties for customization
-- Handle common edge cases gracefully"""
-
         user_content = f"Create a shader with these requirements:\n{requirement}"
 
         if context:
@@ -211,7 +208,7 @@ Guidelines:
             user_content += f"\n\nPrevious compilation failed with errors:\n{compile_errors}\n\nPlease fix these errors."
 
         messages = [
-            SystemMessage(content=system_prompt),
+            _SYS_GENERATE_SHADER,
             HumanMessage(content=user_content),
         ]
 
@@ -229,15 +226,12 @@ Guidelines:
             role: Which model to update
             model_name: New model name
         """
-        if role == ModelRole.ROUTER:
-            self._router_model_name = model_name
-            self._router_model = None  # Reset for lazy init
-        elif role == ModelRole.CODE:
-            self._code_model_name = model_name
-            self._code_model = None
-        elif role == ModelRole.VISION:
-            self._vl_model_name = model_name
-            self._vl_model = None
+        try:
+            model_attr = self._ROLE_MAP[role]
+        except KeyError:
+            raise ValueError(f"Unknown model role: {role}") from None
+        setattr(self, self._ROLE_NAME_ATTRS[role], model_name)
+        setattr(self, model_attr, self._create_model(model_name, self._TEMPERATURES[role]))
 
 
 # Global instance for convenience
@@ -14,6 +14,14 @@ from shader_copilot.models.model_manager import (
 )
 
 
+def _contains_any(text: str, keywords: tuple[str, ...]) -> bool:
+    """Check whether any keyword occurs in text, stopping at the first hit."""
+    for keyword in keywords:
+        if keyword in text:
+            return True
+    return False
+
+
 class Intent(str, Enum):
     """User intent classifications."""
 
@@ -54,6 +62,32 @@ Context clues:
 
 Respond with ONLY the intent name in UPPERCASE, nothing else."""
 
+    # Built once and shared by every classify call
+    _SYSTEM_MSG = SystemMessage(content=CLASSIFICATION_PROMPT)
+
+    # Context prefixes for classify, indexed by (has_image << 1) | has_existing_shader
+    _CONTEXTS = (
+        "",
+        "There is an existing shader in the conversation.",
+        "User has attached an image.",
+        "User has attached an image. There is an existing shader in the conversation.",
+    )
+
+    # Keywords for quick_route; plain substring checks beat a combined regex
+    # for lists this short
+    _SAVE_KEYWORDS = ("保存", "save", "export")
+    _PREVIEW_KEYWORDS = (
+        "切换",
+        "switch to",
+        "preview",
+        "sphere",
+        "cube",
+        "plane",
+        "background",
+    )
+    _GEN_KEYWORDS = ("创建", "生成", "制作", "create", "generate", "make", "build")
+    _SHADER_KEYWORDS = ("shader", "着色器", "材质效果")
+
     def __init__(self, model_manager: Optional[ModelManager] = None):
         """
         Initialize the router agent.
@@ -88,17 +122,14 @@ Respond with ONLY the intent name in UPPERCASE, nothing else."""
             Classified intent
         """
         # Build context-aware prompt
-        context_info = []
-        if has_image:
-            context_info.append("User has attached an image.")
-        if has_existing_shader:
-            context_info.append("There is an existing shader in the conversation.")
-
-        context_str = " ".join(context_info) if context_info else ""
+        context_str = self._CONTEXTS[(has_image << 1) | has_existing_shader]
+        human_content = f"User message: {message}"
+        if context_str:
+            human_content = f"{context_str}\n\n{human_content}"
 
         messages = [
-            SystemMessage(content=self.CLASSIFICATION_PROMPT),
-            HumanMessage(content=f"{context_str}\n\nUser message: {message}".strip()),
+            self._SYSTEM_MSG,
+            HumanMessage(content=human_content.strip()),
         ]
 
         response = await self.model_manager.generate(messages, ModelRole.ROUTER)
@@ -162,32 +193,17 @@ Respond with ONLY the intent name in UPPERCASE, nothing else."""
         message_lower = message.lower()
 
         # Save commands
-        if any(kw in message_lower for kw in ["保存", "save", "export"]):
+        if _contains_any(message_lower, self._SAVE_KEYWORDS):
             return Intent.SAVE_ASSET
 
         # Preview commands
-        if any(
-            kw in message_lower
-            for kw in [
-                "切换",
-                "switch to",
-                "preview",
-                "sphere",
-                "cube",
-                "plane",
-                "background",
-            ]
-        ):
+        if _contains_any(message_lower, self._PREVIEW_KEYWORDS):
             return Intent.PREVIEW_CONFIG
 
         # Generation keywords
-        gen_keywords = ["创建", "生成", "制作", "create", "generate", "make", "build"]
-        shader_keywords = ["shader", "着色器", "材质效果"]
-
-        has_gen = any(kw in message_lower for kw in gen_keywords)
-        has_shader = any(kw in message_lower for kw in shader_keywords)
-
-        if has_gen and has_shader:
+        if _contains_any(message_lower, self._GEN_KEYWORDS) and _contains_any(
+            message_lower, self._SHADER_KEYWORDS
+        ):
             return Intent.GENERATE_SHADER
 
         # Can't determine confidently
@@ -6,30 +6,71 @@ Handles parsing, validation, and routing of WebSocket messages.
 
 import json
 import logging
+import sys
+from datetime import datetime, timezone
 from typing import Any, Callable, Optional
-from uuid import UUID
 
 from pydantic import ValidationError
 
+from ..models.entities import new_uuid
 from .messages import (
+    _MESSAGE_TYPES,
     BaseMessage,
+    ConfirmResponsePayload,
     MessageType,
-    ServerMessageType,
-    UserMessagePayload,
-    SessionInitPayload,
     ToolResponsePayload,
-    UserConfirmPayload,
-    CancelTaskPayload,
     create_error_message,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Pre-serialized frames for the hottest fixed shapes: heartbeats and streamed
+# text. Key order matches BaseMessage.model_dump_json().
+_PONG_TEMPLATE = '{"id":"%s","type":"pong","timestamp":"%s","payload":{}}'
+_STREAM_CHUNK_TEMPLATE = (
+    '{"id":"%s","type":"STREAM_CHUNK","timestamp":"%s",'
+    '"payload":{"content":%s,"is_final":%s}}'
+)
+
+# Recoverable connection-level errors; the id, timestamp and message vary.
+# A client flooding bad frames gets these without any model being built.
+_ERROR_TEMPLATE = (
+    '{"id":"%%s","type":"ERROR","timestamp":"%%s",'
+    '"payload":{"code":"%s","message":%%s,"recoverable":true}}'
+)
+_ERROR_FRAMES = {
+    code: _ERROR_TEMPLATE % code
+    for code in ("PARSE_ERROR", "UNKNOWN_MESSAGE_TYPE", "NO_HANDLER", "HANDLER_ERROR")
+}
+
+
+def _timestamp() -> str:
+    """Current UTC time as BaseMessage renders it."""
+    # isoformat() is several times cheaper than strftime; swap "+00:00" for "Z"
+    return datetime.now(timezone.utc).isoformat()[:-6] + "Z"
+
+
+def _json_string(value: str) -> str:
+    """Encode a str as a JSON string literal."""
+    if orjson is None:
+        return json.dumps(value, ensure_ascii=False)
+    return orjson.dumps(value).decode()
+
+
+def _error_frame(code: str, message: str) -> str:
+    """Serialize a recoverable connection-level ERROR envelope."""
+    return _ERROR_FRAMES[code] % (new_uuid(), _timestamp(), _json_string(message))
+
 
 class MessageParseError(Exception):
     """Error parsing a WebSocket message."""
 
-    def __init__(self, message: str, raw_data: str = ""):
+    def __init__(self, message: str, raw_data: str | bytes = ""):
         super().__init__(message)
         self.raw_data = raw_data
 
@@ -43,9 +84,17 @@ class MessageHandler:
     """
 
     def __init__(self):
-        self._handlers: dict[MessageType, Callable] = {}
-        self._pending_confirms: dict[UUID, Callable] = {}
-        self._pending_tool_calls: dict[UUID, Callable] = {}
+        # Protocol-level messages are handled here; the rest are registered.
+        # Keys are interned wire strings rather than enum members: a dict of
+        # exact str keys takes CPython's faster str-only lookup path.
+        self._handlers: dict[str, Callable] = {}
+        self.register_handler(MessageType.PING, self._handle_ping)
+        self.register_handler(MessageType.CONFIRM_RESPONSE, self._handle_confirm)
+        self.register_handler(MessageType.TOOL_RESPONSE, self._handle_tool_response)
+        # Keyed by the id string exactly as it arrives in the payload, so a
+        # lookup never has to parse it into a UUID (or its bytes) first
+        self._pending_confirms: dict[str, Callable] = {}
+        self._pending_tool_calls: dict[str, Callable] = {}
 
     def register_handler(
         self,
@@ -53,13 +102,16 @@ class MessageHandler:
         handler: Callable[[BaseMessage, Any], Any],
     ) -> None:
         """Register a handler for a message type."""
-        self._handlers[message_type] = handler
-        logger.debug(f"Registered handler for {message_type}")
+        self._handlers[sys.intern(message_type.value)] = handler
+        logger.debug("Registered handler for %s", message_type)
 
-    def parse_message(self, raw_data: str) -> BaseMessage:
+    def parse_message(self, raw_data: str | bytes) -> BaseMessage:
         """
         Parse a raw JSON string into a BaseMessage.
 
+        JSON decoding and validation happen in a single pydantic-core pass,
+        without building an intermediate dict.
+
         Args:
             raw_data: Raw JSON string from WebSocket
 
@@ -70,18 +122,16 @@ class MessageHandler:
             MessageParseError: If parsing fails
         """
         try:
-            data = json.loads(raw_data)
-        except json.JSONDecodeError as e:
-            raise MessageParseError(f"Invalid JSON: {e}", raw_data)
-
-        # Validate required fields
-        if "type" not in data:
-            raise MessageParseError("Missing 'type' field", raw_data)
-
-        try:
-            return BaseMessage.model_validate(data)
+            message = BaseMessage.model_validate_json(raw_data)
         except ValidationError as e:
-            raise MessageParseError(f"Invalid message structure: {e}", raw_data)
+            error = e.errors(include_url=False)[0]
+            if error["type"] == "json_invalid":
+                raise MessageParseError(f"Invalid JSON: {error['ctx']['error']}", raw_data) from e
+            if error["type"] == "missing" and error["loc"] == ("type",):
+                raise MessageParseError("Missing 'type' field", raw_data) from e
+            raise MessageParseError(f"Invalid message structure: {e}", raw_data) from e
+        object.__setattr__(message, "_raw_data", raw_data)
+        return message
 
     def validate_payload(
         self,
@@ -104,81 +154,96 @@ class MessageHandler:
         try:
             return payload_class.model_validate(message.payload)
         except ValidationError as e:
+            # Report the frame as received rather than re-serializing the payload
             raise MessageParseError(
                 f"Invalid payload for {message.type}: {e}",
-                json.dumps(message.payload),
+                getattr(message, "_raw_data", None) or json.dumps(message.payload),
             )
 
+    def decode(self, raw_data: str | bytes) -> BaseMessage | str:
+        """
+        Parse a raw frame, or build the PARSE_ERROR frame to send back.
+
+        Args:
+            raw_data: Raw JSON frame from WebSocket, as text or UTF-8 bytes
+
+        Returns:
+            Parsed BaseMessage, or a pre-serialized error frame
+        """
+        try:
+            return self.parse_message(raw_data)
+        except MessageParseError as e:
+            logger.error("Failed to parse message: %s", e)
+            return _error_frame("PARSE_ERROR", str(e))
+
     async def handle_message(
         self,
-        raw_data: str,
+        raw_data: str | bytes,
         context: Optional[Any] = None,
-    ) -> Optional[BaseMessage]:
+    ) -> BaseMessage | str | None:
         """
         Parse and route a message to its handler.
 
         Args:
-            raw_data: Raw JSON string from WebSocket
+            raw_data: Raw JSON frame from WebSocket, as text or UTF-8 bytes
             context: Optional context to pass to handler
 
         Returns:
-            Response message if handler returns one
+            Response message if handler returns one, possibly already
+            serialized (see serialize_message)
         """
-        try:
-            message = self.parse_message(raw_data)
-        except MessageParseError as e:
-            logger.error(f"Failed to parse message: {e}")
-            return create_error_message(
-                code="PARSE_ERROR",
-                message=str(e),
-                recoverable=True,
-            )
-
-        # Get message type
-        try:
-            msg_type = MessageType(message.type)
-        except ValueError:
-            logger.warning(f"Unknown message type: {message.type}")
-            return create_error_message(
-                code="UNKNOWN_MESSAGE_TYPE",
-                message=f"Unknown message type: {message.type}",
-                recoverable=True,
-            )
+        message = self.decode(raw_data)
+        if isinstance(message, str):
+            return message
+        return await self.dispatch(message, context)
 
-        # Handle special message types
-        if msg_type == MessageType.PING:
-            return BaseMessage(type=ServerMessageType.PONG.value, payload={})
-
-        if msg_type == MessageType.USER_CONFIRM:
-            return await self._handle_confirm(message)
+    async def dispatch(
+        self,
+        message: BaseMessage,
+        context: Optional[Any] = None,
+    ) -> BaseMessage | str | None:
+        """
+        Route a parsed message to its handler.
 
-        if msg_type == MessageType.TOOL_RESPONSE:
-            return await self._handle_tool_response(message)
+        Args:
+            message: Message returned by decode
+            context: Optional context to pass to handler
 
-        # Route to registered handler
-        handler = self._handlers.get(msg_type)
+        Returns:
+            Response message if handler returns one, possibly already
+            serialized (see serialize_message)
+        """
+        # The wire string keys the handler table directly; the enum is only
+        # resolved on the error paths
+        handler = self._handlers.get(message.type)
         if handler is None:
-            logger.warning(f"No handler registered for {msg_type}")
-            return create_error_message(
-                code="NO_HANDLER",
-                message=f"No handler for message type: {msg_type}",
-                recoverable=True,
-            )
+            msg_type = _MESSAGE_TYPES.get(message.type)
+            if msg_type is None:
+                logger.warning("Unknown message type: %s", message.type)
+                return _error_frame(
+                    "UNKNOWN_MESSAGE_TYPE",
+                    f"Unknown message type: {message.type}",
+                )
+            logger.warning("No handler registered for %s", msg_type)
+            return _error_frame("NO_HANDLER", f"No handler for message type: {msg_type}")
 
         try:
             return await handler(message, context)
         except Exception as e:
-            logger.exception(f"Handler error for {msg_type}: {e}")
-            return create_error_message(
-                code="HANDLER_ERROR",
-                message=f"Error processing {msg_type}: {str(e)}",
-                recoverable=True,
-            )
+            msg_type = _MESSAGE_TYPES[message.type]
+            logger.exception("Handler error for %s: %s", msg_type, e)
+            return _error_frame("HANDLER_ERROR", f"Error processing {msg_type}: {str(e)}")
 
-    async def _handle_confirm(self, message: BaseMessage) -> Optional[BaseMessage]:
+    async def _handle_ping(self, message: BaseMessage, context: Optional[Any] = None) -> str:
+        """Answer a heartbeat with a pre-serialized PONG frame."""
+        return _PONG_TEMPLATE % (new_uuid(), _timestamp())
+
+    async def _handle_confirm(
+        self, message: BaseMessage, context: Optional[Any] = None
+    ) -> Optional[BaseMessage]:
         """Handle user confirmation response."""
         try:
-            payload = self.validate_payload(message, UserConfirmPayload)
+            payload = self.validate_payload(message, ConfirmResponsePayload)
         except MessageParseError as e:
             return create_error_message(
                 code="INVALID_CONFIRM",
@@ -188,16 +253,16 @@ class MessageHandler:
         callback = self._pending_confirms.pop(payload.confirm_id, None)
         if callback:
             try:
-                await callback(payload.confirmed, payload.message)
+                await callback(payload.approved)
             except Exception as e:
-                logger.exception(f"Confirm callback error: {e}")
+                logger.exception("Confirm callback error: %s", e)
         else:
-            logger.warning(f"No pending confirm for {payload.confirm_id}")
+            logger.warning("No pending confirm for %s", payload.confirm_id)
 
         return None
 
     async def _handle_tool_response(
-        self, message: BaseMessage
+        self, message: BaseMessage, context: Optional[Any] = None
     ) -> Optional[BaseMessage]:
         """Handle tool response from Unity."""
         try:
@@ -208,34 +273,62 @@ class MessageHandler:
                 message=str(e),
             )
 
-        callback = self._pending_tool_calls.pop(payload.request_id, None)
+        callback = self._pending_tool_calls.pop(payload.tool_call_id, None)
         if callback:
             try:
                 await callback(payload)
             except Exception as e:
-                logger.exception(f"Tool response callback error: {e}")
+                logger.exception("Tool response callback error: %s", e)
         else:
-            logger.warning(f"No pending tool call for {payload.request_id}")
+            logger.warning("No pending tool call for %s", payload.tool_call_id)
 
         return None
 
     def register_confirm_callback(
         self,
-        confirm_id: UUID,
-        callback: Callable[[bool, Optional[str]], Any],
+        confirm_id: str,
+        callback: Callable[[bool], Any],
     ) -> None:
         """Register a callback for a pending confirmation."""
         self._pending_confirms[confirm_id] = callback
 
     def register_tool_callback(
         self,
-        request_id: UUID,
+        tool_call_id: str,
         callback: Callable[[ToolResponsePayload], Any],
     ) -> None:
         """Register a callback for a pending tool call."""
-        self._pending_tool_calls[request_id] = callback
+        self._pending_tool_calls[tool_call_id] = callback
+
+
+def serialize_message(message: BaseMessage | dict[str, Any] | str) -> str:
+    """
+    Serialize a message to JSON string.
+
+    Pre-serialized frames (such as PONG) are passed through unchanged.
+    BaseMessage envelopes serialize entirely inside pydantic-core; plain
+    dicts from the messages factory functions are encoded with orjson when
+    installed.
+    """
+    if isinstance(message, str):
+        return message
+    if isinstance(message, BaseMessage):
+        return message.model_dump_json()
+    if orjson is None:
+        return json.dumps(message, default=str, separators=(",", ":"))
+    return orjson.dumps(message, default=str).decode()
 
 
-def serialize_message(message: BaseMessage) -> str:
-    """Serialize a message to JSON string."""
-    return message.model_dump_json()
+def serialize_stream_chunk(content: str, is_final: bool = False) -> str:
+    """
+    Serialize a STREAM_CHUNK envelope without building a BaseMessage.
+
+    Streaming sends one of these per model flush, so the frame is filled
+    into a fixed template; only the content needs JSON encoding.
+    """
+    return _STREAM_CHUNK_TEMPLATE % (
+        new_uuid(),
+        _timestamp(),
+        _json_string(content),
+        "true" if is_final else "false",
+    )
@@ -5,12 +5,15 @@ Defines the communication protocol between Unity client and Python backend.
 See: contracts/websocket-protocol.md for full specification.
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
+from functools import partial
 from typing import Any, Optional
-from uuid import UUID, uuid4
+from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..models.entities import new_uuid
 
 
 class MessageType(str, Enum):
@@ -44,17 +47,18 @@ class ServerMessageType(str, Enum):
 class BaseMessage(BaseModel):
     """Base message structure shared by all messages."""
 
-    id: UUID = Field(default_factory=uuid4)
+    # Frame the message was decoded from, kept for error reports. A plain
+    # slot rather than a PrivateAttr: private attributes make pydantic run
+    # Python-level initialisation for every validated instance, which
+    # doubled the cost of decoding a frame.
+    __slots__ = ("_raw_data",)
+
+    id: UUID = Field(default_factory=new_uuid)  # Pooled entropy, see models.entities
     type: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Aware UTC, so pydantic-core renders it with a "Z" suffix natively
+    timestamp: datetime = Field(default_factory=partial(datetime.now, timezone.utc))
     payload: dict[str, Any] = Field(default_factory=dict)
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat() + "Z",
-            UUID: str,
-        }
-
 
 # =============================================================================
 # Client → Server Messages
@@ -84,9 +88,23 @@ class ModelConfigPayload(BaseModel):
     vl_model: str = "qwen-vl-plus"
 
 
+class SessionConfigPayload(BaseModel):
+    """Session configuration sent with SESSION_INIT; extra keys are ignored."""
+
+    # "model_config" is reserved by pydantic, so the field is aliased
+    model_config = ConfigDict(populate_by_name=True)
+
+    output_directory: str = "Assets/Shaders/Generated"
+    max_retry_count: int = Field(default=3, ge=0)
+    models: ModelConfigPayload = Field(
+        default_factory=ModelConfigPayload, alias="model_config"
+    )
+
+
 class SessionInitPayload(BaseModel):
     """Payload for SESSION_INIT type."""
 
+    session_id: Optional[str] = None  # Set to resume an existing session
     project_path: Optional[str] = None
     config: dict[str, Any] = Field(default_factory=dict)
 
@@ -275,6 +293,19 @@ def create_session_ready(session_id: str, is_new: bool = True) -> dict:
     )
 
 
+def create_error_message(
+    code: str,
+    message: str,
+    recoverable: bool = False,
+    details: Optional[dict] = None,
+) -> BaseMessage:
+    """Create an ERROR envelope for the connection-level message handler."""
+    payload = {"code": code, "message": message, "recoverable": recoverable}
+    if details:
+        payload["details"] = details
+    return BaseMessage(type=ServerMessageType.ERROR.value, payload=payload)
+
+
 def create_task_complete(session_id: str, message: str = "Task completed") -> dict:
     """Create a TASK_COMPLETE message."""
     return create_message(
@@ -297,6 +328,17 @@ class ParsedMessage(BaseModel):
     payload: Any = None
 
 
+# Lookup tables for parse_message and MessageHandler, built once at import
+_MESSAGE_TYPES: dict[str, MessageType] = {m.value: m for m in MessageType}
+
+_PAYLOAD_TYPES: dict[MessageType, type[BaseModel]] = {
+    MessageType.SESSION_INIT: SessionInitPayload,
+    MessageType.USER_MESSAGE: UserMessagePayload,
+    MessageType.TOOL_RESPONSE: ToolResponsePayload,
+    MessageType.CONFIRM_RESPONSE: ConfirmResponsePayload,
+}
+
+
 def parse_message(raw: dict) -> Optional[ParsedMessage]:
     """
     Parse a raw message dict into a typed message.
@@ -304,27 +346,18 @@ def parse_message(raw: dict) -> Optional[ParsedMessage]:
     Returns None if the message type is invalid.
     """
     type_str = raw.get("type")
-    if not type_str:
+    if not type_str or not isinstance(type_str, str):
         return None
 
-    try:
-        msg_type = MessageType(type_str)
-    except ValueError:
+    msg_type = _MESSAGE_TYPES.get(type_str)
+    if msg_type is None:
         return None
 
     session_id = raw.get("session_id")
     raw_payload = raw.get("payload", {})
 
     # Parse payload based on type
-    payload: Any = raw_payload
-
-    if msg_type == MessageType.SESSION_INIT:
-        payload = SessionInitPayload(**raw_payload)
-    elif msg_type == MessageType.USER_MESSAGE:
-        payload = UserMessagePayload(**raw_payload)
-    elif msg_type == MessageType.TOOL_RESPONSE:
-        payload = ToolResponsePayload(**raw_payload)
-    elif msg_type == MessageType.CONFIRM_RESPONSE:
-        payload = ConfirmResponsePayload(**raw_payload)
+    payload_cls = _PAYLOAD_TYPES.get(msg_type)
+    payload: Any = payload_cls(**raw_payload) if payload_cls else raw_payload
 
     return ParsedMessage(type=msg_type, session_id=session_id, payload=payload)
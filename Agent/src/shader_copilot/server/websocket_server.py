@@ -9,11 +9,12 @@ import asyncio
 import logging
 import signal
 import sys
+from collections.abc import AsyncIterable
 from typing import Optional
 from uuid import UUID
 
 import websockets
-from websockets.server import WebSocketServerProtocol
+from websockets.asyncio.server import Server, ServerConnection, serve
 
 from ..models.config import (
     get_server_config,
@@ -21,48 +22,65 @@ from ..models.config import (
     get_llm_config,
     setup_logging,
 )
-from ..graphs.base.state import SessionState, SessionConfig, ModelConfig
-from .message_handler import MessageHandler, serialize_message
+from ..graphs.base.state import SessionState, SessionConfig
+from .message_handler import MessageHandler, serialize_message, serialize_stream_chunk
 from .messages import (
     BaseMessage,
     MessageType,
     ServerMessageType,
+    SessionConfigPayload,
     SessionInitPayload,
     UserMessagePayload,
-    SessionReadyPayload,
     create_error_message,
-    create_message,
 )
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 logger = logging.getLogger(__name__)
 
+# Parsed messages waiting for the dispatcher; a full queue stops reading,
+# which pushes back on the client through the websocket buffers
+_INBOUND_QUEUE_SIZE = 64
+
+# Resolved by MessageHandler itself, without waiting for queued work
+_INLINE_TYPES = frozenset(
+    t.value for t in (MessageType.PING, MessageType.CONFIRM_RESPONSE, MessageType.TOOL_RESPONSE)
+)
+
+# Queued by send_stream's producer when the chunk source fails, so the
+# stream stops without a final frame
+_STREAM_FAILED = object()
+
 
 class ConnectionManager:
     """Manages WebSocket connections and their associated sessions."""
 
     def __init__(self):
-        self.connections: dict[WebSocketServerProtocol, Optional[SessionState]] = {}
+        self.connections: dict[ServerConnection, Optional[SessionState]] = {}
         self.sessions: dict[UUID, SessionState] = {}
 
-    def add_connection(self, websocket: WebSocketServerProtocol) -> None:
+    def add_connection(self, websocket: ServerConnection) -> None:
         """Register a new connection."""
         self.connections[websocket] = None
-        logger.info(f"New connection from {websocket.remote_address}")
+        logger.info("New connection from %s", websocket.remote_address)
 
-    def remove_connection(self, websocket: WebSocketServerProtocol) -> None:
+    def remove_connection(self, websocket: ServerConnection) -> None:
         """Remove a connection."""
         session = self.connections.pop(websocket, None)
         if session:
-            logger.info(f"Connection closed for session {session.session_id}")
+            logger.info("Connection closed for session %s", session.session_id)
         else:
-            logger.info(f"Connection closed from {websocket.remote_address}")
+            logger.info("Connection closed from %s", websocket.remote_address)
 
-    def get_session(self, websocket: WebSocketServerProtocol) -> Optional[SessionState]:
+    def get_session(self, websocket: ServerConnection) -> Optional[SessionState]:
         """Get the session for a connection."""
         return self.connections.get(websocket)
 
     def set_session(
-        self, websocket: WebSocketServerProtocol, session: SessionState
+        self, websocket: ServerConnection, session: SessionState
     ) -> None:
         """Associate a session with a connection."""
         self.connections[websocket] = session
@@ -86,7 +104,7 @@ class ShaderCopilotServer:
         self.connection_manager = ConnectionManager()
         self.message_handler = MessageHandler()
         self._setup_handlers()
-        self._server: Optional[websockets.WebSocketServer] = None
+        self._server: Optional[Server] = None
         self._shutdown_event = asyncio.Event()
 
     def _setup_handlers(self) -> None:
@@ -111,6 +129,8 @@ class ShaderCopilotServer:
 
         try:
             payload = SessionInitPayload.model_validate(message.payload)
+            # Checked here so a bad config fails now, not inside the graph
+            config = SessionConfigPayload.model_validate(payload.config)
         except Exception as e:
             return create_error_message(
                 code="INVALID_SESSION_INIT",
@@ -118,37 +138,35 @@ class ShaderCopilotServer:
             )
 
         # Check if resuming existing session
-        is_new = True
+        session = None
         if payload.session_id:
-            existing = self.connection_manager.get_session_by_id(payload.session_id)
-            if existing:
-                self.connection_manager.set_session(websocket, existing)
-                is_new = False
-                logger.info(f"Resumed session {payload.session_id}")
-
+            try:
+                session = self.connection_manager.get_session_by_id(UUID(payload.session_id))
+            except ValueError:
+                session = None
+            if session:
+                logger.info("Resumed session %s", payload.session_id)
+
+        is_new = session is None
         if is_new:
             # Create new session
-            model_config = ModelConfig(
-                router_model=payload.config.model_config.router_model,
-                code_model=payload.config.model_config.code_model,
-                vl_model=payload.config.model_config.vl_model,
-            )
-            session_config = SessionConfig(
-                output_directory=payload.config.output_directory,
-                max_retry_count=payload.config.max_retry_count,
-                model_config=model_config,
-            )
             session = SessionState(
-                config=session_config,
-                project_path=payload.project_path,
+                config=SessionConfig.from_dict(
+                    config.model_dump(by_alias=True, exclude_unset=True)
+                ),
+                project_path=payload.project_path or "",
             )
-            self.connection_manager.set_session(websocket, session)
-            logger.info(f"Created new session {session.session_id}")
+            logger.info("Created new session %s", session.session_id)
 
-        session = self.connection_manager.get_session(websocket)
-        return create_message(
-            ServerMessageType.SESSION_READY,
-            SessionReadyPayload(session_id=session.session_id, is_new=is_new),
+        self.connection_manager.set_session(websocket, session)
+        # Cached on the per-connection context for the message handlers
+        context["session"] = session
+
+        # Server-built payloads are trusted, so they go out as plain dicts
+        # rather than through a validated payload model
+        return BaseMessage(
+            type=ServerMessageType.SESSION_READY.value,
+            payload={"session_id": str(session.session_id), "is_new": is_new},
         )
 
     async def _handle_user_message(
@@ -157,8 +175,7 @@ class ShaderCopilotServer:
         context: dict,
     ) -> Optional[BaseMessage]:
         """Handle user message."""
-        websocket = context["websocket"]
-        session = self.connection_manager.get_session(websocket)
+        session = context.get("session")
 
         if not session:
             return create_error_message(
@@ -181,12 +198,13 @@ class ShaderCopilotServer:
 
         # TODO: Route to appropriate graph based on intent
         # For now, just acknowledge
-        logger.info(f"Received user message: {payload.content[:100]}...")
+        # %.100s truncates only if the record is actually emitted
+        logger.info("Received user message: %.100s...", payload.content)
 
         # Placeholder response
-        return create_message(
-            ServerMessageType.STREAM_TEXT,
-            {"content": f"Received: {payload.content}", "is_final": True},
+        return BaseMessage(
+            type=ServerMessageType.STREAM_CHUNK.value,
+            payload={"content": f"Received: {payload.content}", "is_final": True},
         )
 
     async def _handle_cancel_task(
@@ -199,40 +217,131 @@ class ShaderCopilotServer:
         logger.info("Task cancellation requested")
         return None
 
-    async def _connection_handler(self, websocket: WebSocketServerProtocol) -> None:
-        """Handle a WebSocket connection."""
+    async def send_stream(self, websocket: ServerConnection, chunks: AsyncIterable[str]) -> None:
+        """
+        Stream text to the client as STREAM_CHUNK messages.
+
+        Chunks that arrive while a frame is being sent are merged into the
+        next frame, so a fast producer doesn't cost one frame and one socket
+        write per token. The last frame has is_final set; if the chunk source
+        fails, no final frame is sent and its error is raised.
+        """
+        queue: asyncio.Queue[object] = asyncio.Queue()
+
+        async def produce() -> None:
+            try:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+            except BaseException:
+                queue.put_nowait(_STREAM_FAILED)
+                raise
+            queue.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                parts = [await queue.get()]
+                while not queue.empty():
+                    parts.append(queue.get_nowait())
+                done = parts[-1] is None or parts[-1] is _STREAM_FAILED
+                is_final = parts[-1] is None
+                if done:
+                    parts.pop()
+                if parts or is_final:
+                    await websocket.send(serialize_stream_chunk("".join(parts), is_final))
+                if done:
+                    break
+        except BaseException:
+            producer.cancel()
+            raise
+        # Surface errors raised by the producer
+        await producer
+
+    async def _connection_handler(self, websocket: ServerConnection) -> None:
+        """
+        Handle a WebSocket connection.
+
+        Frames are read and parsed by this coroutine and handled by a
+        dispatcher task, so the socket keeps being drained while a handler
+        waits on the LLM. PING, CONFIRM_RESPONSE and TOOL_RESPONSE are
+        answered inline: they must not wait behind the handler that is
+        blocked on them.
+        """
         self.connection_manager.add_connection(websocket)
 
+        # One context per connection; SESSION_INIT stores the session in it
+        context = {"websocket": websocket}
+        inbound: asyncio.Queue[BaseMessage] = asyncio.Queue(maxsize=_INBOUND_QUEUE_SIZE)
+        dispatcher = asyncio.create_task(self._dispatch_loop(websocket, inbound, context))
+        # The dispatcher only ends by failing or being cancelled. If it fails,
+        # stop the reader too, or it would block on a queue nobody drains.
+        reader = asyncio.current_task()
+        dispatcher.add_done_callback(lambda task: task.cancelled() or reader.cancel())
         try:
-            async for raw_message in websocket:
-                context = {"websocket": websocket}
-                response = await self.message_handler.handle_message(
-                    raw_message, context
-                )
-                if response:
-                    await websocket.send(serialize_message(response))
+            while True:
+                # Frames are taken as bytes: pydantic-core validates UTF-8
+                # while decoding JSON, so the text decode would be redundant
+                raw_message = await websocket.recv(decode=False)
+                message = self.message_handler.decode(raw_message)
+                if isinstance(message, str):
+                    await websocket.send(message)
+                elif message.type in _INLINE_TYPES:
+                    response = await self.message_handler.dispatch(message, context)
+                    if response:
+                        await websocket.send(serialize_message(response))
+                else:
+                    await inbound.put(message)
         except websockets.ConnectionClosed as e:
-            logger.info(f"Connection closed: {e}")
+            logger.info("Connection closed: %s", e)
+        except asyncio.CancelledError:
+            if not dispatcher.done() or dispatcher.cancelled():
+                raise
+            reader.uncancel()
+            error = dispatcher.exception()
+            if isinstance(error, websockets.ConnectionClosed):
+                # The client left while a response was being sent
+                logger.info("Connection closed: %s", error)
+            else:
+                logger.error("Dispatcher failed", exc_info=error)
+                await websocket.close(code=1011, reason="internal error")
         except Exception as e:
-            logger.exception(f"Connection error: {e}")
+            logger.exception("Connection error: %s", e)
         finally:
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
             self.connection_manager.remove_connection(websocket)
 
+    async def _dispatch_loop(
+        self,
+        websocket: ServerConnection,
+        inbound: asyncio.Queue[BaseMessage],
+        context: dict,
+    ) -> None:
+        """Handle queued messages in arrival order and send the responses."""
+        while True:
+            message = await inbound.get()
+            response = await self.message_handler.dispatch(message, context)
+            if response:
+                await websocket.send(serialize_message(response))
+
     async def start(self) -> None:
         """Start the WebSocket server."""
         # Validate configuration
         if not self.llm_config.is_configured:
             logger.warning("LLM API key not configured. Set LLM_API_KEY in .env file.")
 
-        logger.info(f"Starting server on {self.config.uri}")
+        logger.info("Starting server on %s", self.config.uri)
 
-        self._server = await websockets.serve(
+        # The editor connects over loopback, where permessage-deflate only
+        # adds zlib work to every frame
+        self._server = await serve(
             self._connection_handler,
             self.config.host,
             self.config.port,
+            compression=None,
         )
 
-        logger.info(f"Server listening on {self.config.uri}")
+        logger.info("Server listening on %s", self.config.uri)
 
         # Wait for shutdown signal
         await self._shutdown_event.wait()
@@ -276,14 +385,16 @@ async def main_async() -> None:
         logger.info("Keyboard interrupt received")
         await server.stop()
     except Exception as e:
-        logger.error(f"Server error: {e}", exc_info=True)
+        logger.error("Server error: %s", e, exc_info=True)
         await server.stop()
         raise
 
 
 def main() -> None:
-    """Main entry point."""
-    asyncio.run(main_async())
+    """Main entry point. Runs on uvloop when it is installed (not on Windows)."""
+    loop_factory = uvloop.new_event_loop if uvloop else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main_async())
 
 
 if __name__ == "__main__":
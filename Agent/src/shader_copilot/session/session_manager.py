@@ -4,18 +4,46 @@ Session management for ShaderCopilot.
 Handles conversation history, shader state, and persistence.
 """
 
+import asyncio
+import hashlib
 import json
+import logging
+import os
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, Optional
 from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_SHADER_NAME_RE = re.compile(r'Shader\s+"([^"]+)"')
+
+_ROLE_PREFIXES = {"user": "User", "assistant": "Assistant", "system": "System"}
+
+# Saved incrementally to the session's event log; see SessionManager.save_session
+_LOGGED_LISTS = frozenset({"messages", "shader_history"})
+
+# Logged events after which save_session rewrites the snapshot instead
+_COMPACT_AFTER = 256
 
 
 class Message(BaseModel):
     """A single message in the conversation."""
 
+    # Immutable once recorded, so instances can be shared rather than copied
+    model_config = ConfigDict(frozen=True)
+
     role: str  # "user", "assistant", "system"
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -25,6 +53,8 @@ class Message(BaseModel):
 class ShaderVersion(BaseModel):
     """A version of the shader in the conversation."""
 
+    model_config = ConfigDict(frozen=True)
+
     code: str
     name: str = ""
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -53,11 +83,18 @@ class Session(BaseModel):
     preview_object: str = "Sphere"
     background_color: str = "#1E1E1E"
 
+    # Codes present in shader_history, indexed incrementally by _has_version
+    _history_codes: set[str] = PrivateAttr(default_factory=set)
+    _history_indexed: int = PrivateAttr(default=0)
+    # (max_messages, message count, context) from the last build_context call
+    _context_cache: Optional[tuple[int, int, str]] = PrivateAttr(default=None)
+
     def add_message(self, role: str, content: str, **metadata):
         """Add a message to the conversation."""
         msg = Message(role=role, content=content, metadata=metadata)
         self.messages.append(msg)
-        self.updated_at = datetime.utcnow()
+        # Same instant as the message; saves a second clock read
+        self.updated_at = msg.timestamp
 
     def set_current_shader(
         self, code: str, name: str = "", compile_success: bool = True
@@ -66,8 +103,7 @@ class Session(BaseModel):
         # Add previous to history if exists
         if self.current_shader:
             # Find if we have a version with this exact code
-            existing = [v for v in self.shader_history if v.code == self.current_shader]
-            if not existing:
+            if not self._has_version(self.current_shader):
                 version = ShaderVersion(
                     code=self.current_shader,
                     name=self._extract_shader_name(self.current_shader),
@@ -75,7 +111,6 @@ class Session(BaseModel):
                 self.shader_history.append(version)
 
         self.current_shader = code
-        self.updated_at = datetime.utcnow()
 
         # Add new version to history
         version = ShaderVersion(
@@ -84,6 +119,19 @@ class Session(BaseModel):
             compile_success=compile_success,
         )
         self.shader_history.append(version)
+        self.updated_at = version.created_at
+
+    def _has_version(self, code: str) -> bool:
+        """Check whether shader_history holds a version with this exact code."""
+        history = self.shader_history
+        if self._history_indexed > len(history):
+            # History was truncated or replaced; index it again
+            self._history_codes.clear()
+            self._history_indexed = 0
+        if self._history_indexed < len(history):
+            self._history_codes.update(v.code for v in history[self._history_indexed :])
+            self._history_indexed = len(history)
+        return code in self._history_codes
 
     def get_shader_history(self) -> list[ShaderVersion]:
         """Get the shader history."""
@@ -94,32 +142,36 @@ class Session(BaseModel):
         self.properties[name] = value
         self.updated_at = datetime.utcnow()
 
-    def get_properties(self) -> dict[str, str]:
-        """Get all user property customizations."""
-        return self.properties.copy()
+    def get_properties(self) -> Mapping[str, str]:
+        """Get a read-only view of the user property customizations."""
+        return MappingProxyType(self.properties)
 
     def build_context(self, max_messages: int = 10) -> str:
-        """Build context string from conversation history."""
+        """
+        Build context string from conversation history.
+
+        Messages are frozen and only ever appended, so the result is reused
+        until a message is added.
+        """
+        cached = self._context_cache
+        if cached is not None and cached[0] == max_messages and cached[1] == len(self.messages):
+            return cached[2]
+
         recent = (
             self.messages[-max_messages:]
             if len(self.messages) > max_messages
             else self.messages
         )
 
-        context_parts = []
-        for msg in recent:
-            prefix = {"user": "User", "assistant": "Assistant", "system": "System"}.get(
-                msg.role, msg.role
-            )
-            context_parts.append(f"{prefix}: {msg.content}")
-
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(
+            f"{_ROLE_PREFIXES.get(msg.role, msg.role)}: {msg.content}" for msg in recent
+        )
+        self._context_cache = (max_messages, len(self.messages), context)
+        return context
 
     def _extract_shader_name(self, code: str) -> str:
         """Extract shader name from code."""
-        import re
-
-        match = re.search(r'Shader\s+"([^"]+)"', code)
+        match = _SHADER_NAME_RE.search(code)
         return match.group(1) if match else "Unknown"
 
     def to_dict(self) -> dict:
@@ -131,6 +183,47 @@ class Session(BaseModel):
         """Create from dictionary."""
         return cls.model_validate(data)
 
+    def to_json(self) -> bytes:
+        """Serialize to indented UTF-8 JSON in a single pydantic-core pass."""
+        return self.__pydantic_serializer__.to_json(self, indent=2)
+
+    @classmethod
+    def from_json(cls, data: str | bytes) -> "Session":
+        """Create from JSON text, decoding and validating in one pass."""
+        return cls.model_validate_json(data)
+
+
+# Fields a "state" event can set; the lists are logged as separate events
+_STATE_FIELDS = frozenset(Session.model_fields) - _LOGGED_LISTS
+
+# Built once at import; loading goes straight to its core validator
+_SESSION_ADAPTER = TypeAdapter(Session)
+_MESSAGES_ADAPTER = TypeAdapter(list[Message])
+_VERSIONS_ADAPTER = TypeAdapter(list[ShaderVersion])
+
+
+@dataclass(slots=True, kw_only=True)
+class _LogCursor:
+    """How much of a session is already on disk."""
+
+    messages: int
+    versions: int
+    state: dict[str, Any]
+    events: int = 0
+
+
+@dataclass(slots=True, kw_only=True)
+class _PendingSave:
+    """A save encoded by SessionManager, ready to be written."""
+
+    path: Path
+    data: bytes
+    # True: replace the snapshot and drop the log; False: append to the log
+    snapshot: bool
+    cursor: _LogCursor
+    # First line of the log the events belong to (appends only)
+    header: bytes = b""
+
 
 class SessionManager:
     """
@@ -148,9 +241,18 @@ class SessionManager:
         """
         self._sessions: dict[str, Session] = {}
         self._storage_path = storage_path
+        # IDs of the sessions on disk: scanned once here, then kept in step
+        # by save_session/delete_session so listing never touches the disk
+        self._stored_ids: set[str] = set()
+        # Per saved or loaded session: what its snapshot plus log hold
+        self._log_cursors: dict[str, _LogCursor] = {}
+        # Digest of each stored snapshot, which its log's header must carry
+        self._snapshot_digests: dict[str, str] = {}
+        self._save_lock = asyncio.Lock()
 
         if storage_path:
             storage_path.mkdir(parents=True, exist_ok=True)
+            self._stored_ids = {f.stem for f in storage_path.glob("*.json")}
 
     def create_session(self, session_id: Optional[str] = None) -> Session:
         """
@@ -193,6 +295,27 @@ class SessionManager:
 
         return None
 
+    async def aget_session(self, session_id: str) -> Optional[Session]:
+        """
+        Get an existing session, reading it from storage in a worker thread.
+
+        Args:
+            session_id: Session ID to retrieve
+
+        Returns:
+            Session if found, None otherwise
+        """
+        if session_id in self._sessions:
+            return self._sessions[session_id]
+
+        if self._storage_path:
+            session = await asyncio.to_thread(self._load_session, session_id)
+            if session:
+                # A concurrent call may have loaded it first; keep that one
+                return self._sessions.setdefault(session_id, session)
+
+        return None
+
     def get_or_create_session(self, session_id: str) -> Session:
         """
         Get an existing session or create a new one.
@@ -212,26 +335,209 @@ class SessionManager:
         """
         Save a session to storage.
 
+        The first save writes a full snapshot; later saves append only the
+        messages, shader versions and fields that changed since to the
+        session's event log, which is folded back into the snapshot every
+        _COMPACT_AFTER events (see compact_session).
+
         Args:
             session_id: Session ID to save
 
         Returns:
             True if saved successfully
         """
-        if not self._storage_path:
+        pending = self._encode_save(session_id)
+        if pending is None:
+            return False
+        return self._finish_save(session_id, pending, self._write_save(pending))
+
+    async def asave_session(self, session_id: str) -> bool:
+        """
+        Save a session without blocking the event loop on disk I/O.
+
+        The session is encoded on the loop, where it can't change under the
+        encoder; only the file write runs in a worker thread. Saves through
+        this method are serialized so log appends land in order.
+
+        Args:
+            session_id: Session ID to save
+
+        Returns:
+            True if saved successfully
+        """
+        async with self._save_lock:
+            pending = self._encode_save(session_id)
+            if pending is None:
+                return False
+            written = await asyncio.to_thread(self._write_save, pending)
+            return self._finish_save(session_id, pending, written)
+
+    def compact_session(self, session_id: str) -> bool:
+        """
+        Rewrite a session's full snapshot and drop its event log.
+
+        Args:
+            session_id: Session ID to compact
+
+        Returns:
+            True if saved successfully
+        """
+        pending = self._encode_save(session_id, compact=True)
+        if pending is None:
             return False
+        return self._finish_save(session_id, pending, self._write_save(pending))
+
+    def _encode_save(self, session_id: str, compact: bool = False) -> Optional[_PendingSave]:
+        """Encode what save_session would write, without touching the disk."""
+        if not self._storage_path:
+            return None
 
         session = self._sessions.get(session_id)
         if not session:
+            return None
+
+        cursor = self._log_cursors.get(session_id)
+        if (
+            compact
+            or cursor is None
+            or cursor.events >= _COMPACT_AFTER
+            # Lists were truncated or replaced: the log can't express that
+            or cursor.messages > len(session.messages)
+            or cursor.versions > len(session.shader_history)
+        ):
+            try:
+                if orjson is not None:
+                    # Encodes datetimes natively, so the python-mode dump is enough
+                    data = orjson.dumps(session.model_dump(), option=orjson.OPT_INDENT_2)
+                else:
+                    data = session.to_json()
+            except Exception:
+                return None
+            return _PendingSave(
+                path=self._storage_path / f"{session_id}.json",
+                data=data,
+                snapshot=True,
+                cursor=_LogCursor(
+                    messages=len(session.messages),
+                    versions=len(session.shader_history),
+                    state=_state_of(session),
+                ),
+            )
+
+        digest = self._snapshot_digest(session_id)
+        if digest is None:
+            return self._encode_save(session_id, compact=True)
+
+        # Each new slice is dumped in one serializer call, not per model
+        messages = _MESSAGES_ADAPTER.dump_python(session.messages[cursor.messages :], mode="json")
+        versions = _VERSIONS_ADAPTER.dump_python(
+            session.shader_history[cursor.versions :], mode="json"
+        )
+        events = [{"type": "message", "data": m} for m in messages]
+        events.extend({"type": "shader", "data": v} for v in versions)
+        state = _state_of(session)
+        changed = {k: v for k, v in state.items() if cursor.state.get(k) != v}
+        if changed:
+            events.append({"type": "state", "data": changed})
+
+        return _PendingSave(
+            path=self._storage_path / f"{session_id}.jsonl",
+            data=_encode_lines(events),
+            snapshot=False,
+            header=_log_header(digest),
+            cursor=_LogCursor(
+                messages=len(session.messages),
+                versions=len(session.shader_history),
+                state=state,
+                events=cursor.events + len(events),
+            ),
+        )
+
+    @staticmethod
+    def _write_save(pending: _PendingSave) -> bool:
+        """Write an encoded save. Touches no manager state, so it can run in a thread."""
+        try:
+            if pending.snapshot:
+                # Replaced in one step, so a crash leaves the old or the new
+                # snapshot, never a truncated one. A log left behind by a
+                # crash before the unlink no longer matches it (see _replay).
+                temp_path = pending.path.with_name(pending.path.name + ".tmp")
+                temp_path.write_bytes(pending.data)
+                os.replace(temp_path, pending.path)
+                pending.path.with_suffix(".jsonl").unlink(missing_ok=True)
+            elif pending.data:
+                _append_lines(pending.path, pending.data, pending.header)
+        except Exception:
+            return False
+        return True
+
+    def _finish_save(self, session_id: str, pending: _PendingSave, written: bool) -> bool:
+        """Record a written save so the next one only appends what's new."""
+        if not written:
+            # Part of the write may be on disk; only a snapshot is safe now
+            self._log_cursors.pop(session_id, None)
+            self._snapshot_digests.pop(session_id, None)
+            return False
+        if pending.snapshot:
+            self._stored_ids.add(session_id)
+            self._snapshot_digests[session_id] = _digest(pending.data)
+        self._log_cursors[session_id] = pending.cursor
+        return True
+
+    def append_event(self, session_id: str, event: dict[str, Any]) -> bool:
+        """
+        Append one event to a stored session's log.
+
+        Events are replayed over the snapshot on load: "message" and
+        "shader" append their data to the matching list, "state" sets
+        the fields it carries.
+
+        Args:
+            session_id: Session ID the event belongs to
+            event: Event dict with "type" and "data"
+
+        Returns:
+            True if written
+
+        Raises:
+            ValueError: If the event type is unknown or its data is invalid
+        """
+        kind, value = _parse_event(event)
+        if not self._storage_path or session_id not in self._stored_ids:
+            return False
+
+        digest = self._snapshot_digest(session_id)
+        if digest is None:
             return False
+        if kind == "message":
+            value = _MESSAGES_ADAPTER.dump_python([value], mode="json")[0]
+        elif kind == "shader":
+            value = _VERSIONS_ADAPTER.dump_python([value], mode="json")[0]
 
         try:
-            file_path = self._storage_path / f"{session_id}.json"
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(session.to_dict(), f, indent=2, ensure_ascii=False)
-            return True
+            _append_lines(
+                self._storage_path / f"{session_id}.jsonl",
+                _encode_lines([{"type": kind, "data": value}]),
+                _log_header(digest),
+            )
         except Exception:
+            self._log_cursors.pop(session_id, None)
             return False
+        # The in-memory session no longer matches what save_session last
+        # wrote, so the next save rewrites the snapshot
+        self._log_cursors.pop(session_id, None)
+        return True
+
+    def _snapshot_digest(self, session_id: str) -> Optional[str]:
+        """Digest of the session's stored snapshot, read from disk if not known."""
+        digest = self._snapshot_digests.get(session_id)
+        if digest is None:
+            try:
+                data = (self._storage_path / f"{session_id}.json").read_bytes()
+            except OSError:
+                return None
+            digest = self._snapshot_digests[session_id] = _digest(data)
+        return digest
 
     def delete_session(self, session_id: str) -> bool:
         """
@@ -247,6 +553,10 @@ class SessionManager:
             del self._sessions[session_id]
 
         if self._storage_path:
+            self._stored_ids.discard(session_id)
+            self._log_cursors.pop(session_id, None)
+            self._snapshot_digests.pop(session_id, None)
+            (self._storage_path / f"{session_id}.jsonl").unlink(missing_ok=True)
             file_path = self._storage_path / f"{session_id}.json"
             if file_path.exists():
                 file_path.unlink()
@@ -261,16 +571,10 @@ class SessionManager:
         Returns:
             List of session IDs
         """
-        session_ids = set(self._sessions.keys())
-
-        if self._storage_path:
-            for f in self._storage_path.glob("*.json"):
-                session_ids.add(f.stem)
-
-        return sorted(session_ids)
+        return sorted(self._sessions.keys() | self._stored_ids)
 
     def _load_session(self, session_id: str) -> Optional[Session]:
-        """Load a session from storage."""
+        """Load a session from storage, replaying its event log if any."""
         if not self._storage_path:
             return None
 
@@ -279,12 +583,131 @@ class SessionManager:
             return None
 
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return Session.from_dict(data)
+            snapshot = file_path.read_bytes()
+            digest = _digest(snapshot)
+            log_path = self._storage_path / f"{session_id}.jsonl"
+            if not log_path.exists():
+                # Decoded and validated in one pass, with or without orjson
+                session = _SESSION_ADAPTER.validate_json(snapshot)
+                events = 0
+            else:
+                data = _loads(snapshot)
+                events = _replay(data, log_path.read_bytes(), digest)
+                session = _SESSION_ADAPTER.validate_python(data)
         except Exception:
             return None
 
+        self._snapshot_digests[session_id] = digest
+
+        self._log_cursors[session_id] = _LogCursor(
+            messages=len(session.messages),
+            versions=len(session.shader_history),
+            state=_state_of(session),
+            events=events,
+        )
+        return session
+
+
+def _state_of(session: Session) -> dict[str, Any]:
+    """Fields of a session that a "state" event can carry."""
+    return session.model_dump(mode="json", exclude=_LOGGED_LISTS)
+
+
+def _encode_lines(events: list[dict[str, Any]]) -> bytes:
+    """Encode events as JSON lines."""
+    if orjson is not None:
+        return b"".join(orjson.dumps(e) + b"\n" for e in events)
+    return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events).encode()
+
+
+def _digest(snapshot: bytes) -> str:
+    """Identify a snapshot's exact bytes."""
+    return hashlib.blake2b(snapshot, digest_size=16).hexdigest()
+
+
+def _log_header(digest: str) -> bytes:
+    """First line of a log: the digest of the snapshot its events extend."""
+    return b'{"type": "log", "snapshot": "%s"}\n' % digest.encode()
+
+
+def _append_lines(path: Path, data: bytes, header: bytes) -> None:
+    """
+    Append encoded lines to the log that starts with ``header``.
+
+    A log with another header belongs to an older snapshot, which already
+    holds its events, so it is started afresh. Appends begin on a fresh
+    line after a torn write.
+    """
+    with open(path, "ab+") as f:
+        f.seek(0)
+        if f.readline() != header:
+            f.truncate(0)
+            data = header + data
+        else:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+
+
+def _parse_event(event: Any) -> tuple[str, Any]:
+    """
+    Validate a log event; returns its type and data.
+
+    "message" and "shader" data come back as models, "state" data as the
+    JSON-compatible fields it sets.
+
+    Raises:
+        ValueError: If the type is unknown or the data is invalid
+    """
+    kind = event.get("type") if isinstance(event, dict) else None
+    data = event.get("data") if isinstance(event, dict) else None
+    if kind == "message":
+        return kind, _MESSAGES_ADAPTER.validate_python([data])[0]
+    if kind == "shader":
+        return kind, _VERSIONS_ADAPTER.validate_python([data])[0]
+    if kind == "state" and isinstance(data, dict) and data.keys() <= _STATE_FIELDS:
+        state = Session.model_validate({"session_id": "", **data})
+        return kind, state.model_dump(mode="json", include=set(data))
+    raise ValueError(f"Invalid session log event: {event!r:.200}")
+
+
+def _loads(data: bytes) -> Any:
+    """Decode JSON bytes, with orjson when it is installed."""
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def _replay(data: dict[str, Any], log: bytes, digest: str) -> int:
+    """Apply logged events to a snapshot dict; returns the number applied."""
+    lines = log.splitlines()
+    try:
+        header = _loads(lines[0]) if lines else None
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("snapshot") != digest:
+        # Left over from an older snapshot that already holds its events
+        return 0
+
+    applied = 0
+    for line in lines[1:]:
+        try:
+            kind, value = _parse_event(_loads(line))
+        except ValueError:
+            # A save interrupted mid-write leaves a torn line; the next
+            # append starts after it, so only the torn event is lost
+            logger.warning("Skipping invalid line in session log: %.200r", line)
+            continue
+        if kind == "message":
+            data["messages"].append(value)
+        elif kind == "shader":
+            data["shader_history"].append(value)
+        else:
+            data.update(value)
+        applied += 1
+    return applied
+
 
 # Global session manager instance
 _session_manager: Optional[SessionManager] = None
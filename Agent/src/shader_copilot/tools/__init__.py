@@ -11,6 +11,7 @@ from shader_copilot.tools.unity_tools import (
     UNITY_TOOL_DEFINITIONS,
     UnityToolError,
     UnityTools,
+    get_openai_tool_definitions,
 )
 
 __all__ = [
@@ -24,4 +25,5 @@ __all__ = [
     "UnityTools",
     "UnityToolError",
     "UNITY_TOOL_DEFINITIONS",
+    "get_openai_tool_definitions",
 ]
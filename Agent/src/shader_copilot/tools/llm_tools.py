@@ -2,6 +2,7 @@
 LLM-powered tools for shader generation.
 """
 
+import json
 from typing import Any, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -12,6 +13,11 @@ from shader_copilot.models.model_manager import (
     get_model_manager,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 async def generate_shader_code(
     requirement: str,
@@ -49,20 +55,26 @@ Requirements:
 Your response must contain ONLY the complete shader code.
 Do not include any explanations before or after the code."""
 
-    user_content = f"Create a shader with these requirements:\n{requirement}"
+    # Sections are joined once, so large context or previous code is
+    # copied a single time rather than on every +=
+    parts = ["Create a shader with these requirements:\n", requirement]
 
     if context:
-        user_content += f"\n\nContext:\n{context}"
+        parts += ("\n\nContext:\n", context)
 
     if previous_code:
-        user_content += f"\n\nPrevious code to modify:\n```hlsl\n{previous_code}\n```"
+        parts += ("\n\nPrevious code to modify:\n```hlsl\n", previous_code, "\n```")
 
     if compile_errors:
-        user_content += f"\n\nThe previous code had these compilation errors:\n{compile_errors}\n\nPlease fix these errors."
+        parts += (
+            "\n\nThe previous code had these compilation errors:\n",
+            compile_errors,
+            "\n\nPlease fix these errors.",
+        )
 
     messages = [
         SystemMessage(content=system_prompt),
-        HumanMessage(content=user_content),
+        HumanMessage(content="".join(parts)),
     ]
 
     response = await model_manager.generate(messages, ModelRole.CODE)
@@ -105,15 +117,16 @@ Return ONLY the JSON object, no other text."""
     response = await model_manager.generate(messages, ModelRole.ROUTER)
 
     # Parse JSON response
-    import json
-
     try:
-        # Clean up response
+        # Clean up response: drop the opening and closing fence lines
         cleaned = response.strip()
         if cleaned.startswith("```"):
-            lines = cleaned.split("\n")
-            cleaned = "\n".join(lines[1:-1])
-        return json.loads(cleaned)
+            body = cleaned.find("\n") + 1
+            cleaned = cleaned[body : cleaned.rfind("\n")] if body else ""
+        if orjson is None:
+            return json.loads(cleaned)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(cleaned)
     except json.JSONDecodeError:
         return {
             "shader_type": "custom",
@@ -253,28 +266,41 @@ Apply the changes and return the complete modified shader."""
     return _extract_code(response)
 
 
+def _find_fence(text: str, start: int) -> int:
+    """Return the start of the first line at or after start that opens with ```."""
+    i = text.find("```", start)
+    while i != -1:
+        line_start = text.rfind("\n", 0, i) + 1
+        if line_start == i or text[line_start:i].isspace():
+            return line_start
+        i = text.find("```", i + 3)
+    return -1
+
+
 def _extract_code(response: str) -> str:
     """Extract code from markdown response."""
-    if "```" in response:
-        lines = response.split("\n")
-        in_block = False
-        code_lines = []
-
-        for line in lines:
-            if line.strip().startswith("```"):
-                if in_block:
-                    break
-                in_block = True
-                continue
-            if in_block:
-                code_lines.append(line)
-
-        if code_lines:
-            return "\n".join(code_lines)
+    # The prompt asks for bare shader code; when the model complies there is
+    # nothing to search for
+    stripped = response.strip()
+    if stripped.startswith('Shader "'):
+        return stripped
+
+    # Fences are located with str.find, so long responses are never split
+    # into lines; only the few ``` occurrences are inspected
+    fence = _find_fence(response, 0)
+    if fence != -1:
+        body = response.find("\n", fence) + 1
+        if body:
+            end = _find_fence(response, body)
+            if end == -1:
+                return response[body:]
+            if end > body:
+                # Drop the newline that precedes the closing fence
+                return response[body : end - 1]
 
     # Find Shader declaration
-    if 'Shader "' in response:
-        idx = response.find('Shader "')
-        return response[idx:].strip()
+    _, marker, rest = response.partition('Shader "')
+    if marker:
+        return (marker + rest).strip()
 
-    return response.strip()
+    return stripped
@@ -4,10 +4,17 @@ Unity tool wrappers for interacting with Unity Editor.
 These tools send requests to Unity via WebSocket and wait for responses.
 """
 
-from typing import Any, Callable, Optional
-from uuid import uuid4
+import asyncio
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
+from secrets import token_hex
+from typing import Any, Optional
 
-from shader_copilot.graphs.shader_gen.state import CompileResult
+from shader_copilot.graphs.shader_gen.state import (
+    CompileError,
+    CompileResult,
+    CompileStatus,
+)
 
 
 class UnityToolError(Exception):
@@ -38,6 +45,53 @@ class UnityTools:
         self._send_tool_call = send_tool_call
         self._wait_for_response = wait_for_response
 
+    async def call_batch(
+        self,
+        calls: list[tuple[str, dict[str, Any]]],
+    ) -> list[dict[str, Any]]:
+        """
+        Issue independent tool calls together and wait for all responses.
+
+        Every call is sent before any response is awaited, so N calls cost
+        about one Unity round trip instead of N. Use it only for calls that
+        don't depend on each other's results (e.g. save_shader and
+        save_material).
+
+        Args:
+            calls: (tool_name, arguments) pairs
+
+        Returns:
+            Raw responses, in the order of calls
+        """
+        tool_call_ids = [token_hex(16) for _ in calls]
+        # Start waiting before sending, so an early response isn't missed
+        waits = [asyncio.ensure_future(self._wait_for_response(i)) for i in tool_call_ids]
+        try:
+            for tool_call_id, (tool_name, arguments) in zip(tool_call_ids, calls, strict=True):
+                await self._send_tool_call(tool_call_id, tool_name, arguments)
+            return list(await asyncio.gather(*waits))
+        except BaseException:
+            for wait in waits:
+                wait.cancel()
+            raise
+
+    async def gather(self, *calls: Awaitable[Any]) -> list[Any]:
+        """
+        Run independent tool method calls concurrently.
+
+        Like call_batch, but for the typed methods, e.g.
+        ``await tools.gather(tools.save_shader(a), tools.save_material(b))``.
+        Each call's send goes out while the others are still waiting on
+        Unity, so their round trips overlap. If one call fails, the rest
+        are cancelled and the error is raised.
+
+        Returns:
+            Results, in the order of calls
+        """
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(call) for call in calls]
+        return [task.result() for task in tasks]
+
     async def compile_shader(
         self,
         code: str,
@@ -55,7 +109,7 @@ class UnityTools:
         Returns:
             CompileResult with success status and errors
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "code": code,
@@ -73,10 +127,14 @@ class UnityTools:
         response = await self._wait_for_response(tool_call_id)
 
         return CompileResult(
-            success=response.get("success", False),
-            errors=response.get("errors", []),
-            warnings=response.get("warnings", []),
-            shader_path=response.get("shader_path"),
+            status=(
+                CompileStatus.SUCCESS
+                if response.get("success", False)
+                else CompileStatus.FAILED
+            ),
+            shader_id=response.get("shader_id"),
+            errors=[CompileError.from_dict(e) for e in response.get("errors", [])],
+            warnings=[CompileError.from_dict(w) for w in response.get("warnings", [])],
         )
 
     async def create_material(
@@ -96,7 +154,7 @@ class UnityTools:
         Returns:
             Result with material path
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "shader_path": shader_path,
@@ -128,7 +186,7 @@ class UnityTools:
         Returns:
             Result with success status
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "material_path": material_path,
@@ -154,7 +212,7 @@ class UnityTools:
         Returns:
             Result with screenshot data or path
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "width": width,
@@ -182,7 +240,7 @@ class UnityTools:
         Returns:
             Result with final path
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "shader_path": shader_path,
@@ -209,7 +267,7 @@ class UnityTools:
         Returns:
             Result with final path
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "material_path": material_path,
@@ -228,7 +286,7 @@ class UnityTools:
         Returns:
             List of available object names
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         await self._send_tool_call(tool_call_id, "list_preview_objects", {})
         response = await self._wait_for_response(tool_call_id)
@@ -245,7 +303,7 @@ class UnityTools:
         Returns:
             Result with success status
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {
             "object_name": object_name,
@@ -269,7 +327,7 @@ class UnityTools:
         Returns:
             Result with success status
         """
-        tool_call_id = str(uuid4())
+        tool_call_id = token_hex(16)
 
         arguments = {}
 
@@ -282,8 +340,10 @@ class UnityTools:
         return await self._wait_for_response(tool_call_id)
 
 
-# Tool definitions for LangGraph
-UNITY_TOOL_DEFINITIONS = [
+# Tool definitions for LangGraph. A tuple so the shared constant can't be
+# extended by a caller; the inner dicts stay plain dicts because LLM clients
+# JSON-encode them as-is.
+UNITY_TOOL_DEFINITIONS = (
     {
         "name": "compile_shader",
         "description": "Compile shader code in Unity Editor",
@@ -370,4 +430,14 @@ UNITY_TOOL_DEFINITIONS = [
             "required": ["material_path"],
         },
     },
-]
+)
+
+
+@lru_cache(maxsize=1)
+def get_openai_tool_definitions() -> tuple[dict[str, Any], ...]:
+    """
+    UNITY_TOOL_DEFINITIONS in the OpenAI-compatible "tools" format.
+
+    Built on first use and shared afterwards; treat the result as read-only.
+    """
+    return tuple({"type": "function", "function": d} for d in UNITY_TOOL_DEFINITIONS)
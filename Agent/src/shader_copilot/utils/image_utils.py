@@ -2,11 +2,37 @@
 Image encoding/decoding utilities for handling reference images.
 """
 
-import base64
 import io
-import mimetypes
+import struct
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
+
+try:
+    # SIMD codec with the same call signatures as the stdlib functions
+    from pybase64 import b64decode, b64encode_as_string
+except ImportError:
+    from base64 import b64decode, b64encode
+
+    def b64encode_as_string(s: bytes) -> str:
+        """Base64-encode bytes straight to an ASCII str."""
+        return b64encode(s).decode("ascii")
+
+# Accepted reference image suffixes. A fixed table rather than mimetypes,
+# which loads the system MIME databases on first use.
+_IMAGE_MIME = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".jpe": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".avif": "image/avif",
+    ".heic": "image/heic",
+}
 
 
 def encode_image_to_base64(image_path: str | Path) -> Tuple[str, str]:
@@ -29,15 +55,15 @@ def encode_image_to_base64(image_path: str | Path) -> Tuple[str, str]:
         raise FileNotFoundError(f"Image file not found: {path}")
 
     # Detect MIME type
-    mime_type, _ = mimetypes.guess_type(str(path))
-    if mime_type is None or not mime_type.startswith("image/"):
+    mime_type = _IMAGE_MIME.get(path.suffix.lower())
+    if mime_type is None:
         raise ValueError(f"Unsupported file type: {path.suffix}")
 
-    # Read and encode
+    # Read and encode. The file bytes are only referenced by the call, so
+    # they are freed before the str is built; pybase64 builds it directly,
+    # without an intermediate bytes object.
     with open(path, "rb") as f:
-        data = f.read()
-
-    base64_str = base64.b64encode(data).decode("utf-8")
+        base64_str = b64encode_as_string(f.read())
     return base64_str, mime_type
 
 
@@ -51,13 +77,77 @@ def decode_base64_to_bytes(base64_str: str) -> bytes:
     Returns:
         Decoded bytes
     """
-    # Remove data URL prefix if present
-    if base64_str.startswith("data:"):
-        # Format: data:image/png;base64,xxxxx
-        _, data = base64_str.split(",", 1)
-        return base64.b64decode(data)
+    return b64decode(split_data_url(base64_str)[1])
+
+
+def split_data_url(base64_str: str) -> Tuple[Optional[str], str]:
+    """
+    Split a data URL into its MIME type and base64 payload in one pass.
 
-    return base64.b64decode(base64_str)
+    Args:
+        base64_str: Base64 string, possibly with data URL prefix
+
+    Returns:
+        Tuple of (mime_type, payload). mime_type is None when there is no
+        data URL prefix or the prefix names no type; payload is the input
+        unchanged when there is no prefix.
+    """
+    if not base64_str.startswith("data:"):
+        return None, base64_str
+
+    # Format: data:image/png;base64,xxxxx. partition stops at the first
+    # comma, so the payload is scanned no further.
+    head, _, payload = base64_str.partition(",")
+    mime_type, sep, _ = head[5:].partition(";")
+    return (mime_type if sep else None), payload
+
+
+def strip_data_url(base64_str: str) -> str:
+    """
+    Remove a data URL prefix, returning the bare base64 payload.
+
+    Args:
+        base64_str: Base64 string, possibly with data URL prefix
+
+    Returns:
+        Base64 payload without the prefix
+    """
+    return split_data_url(base64_str)[1]
+
+
+def sniff_image_mime(base64_str: str, default: str = "image/png") -> str:
+    """
+    Detect the image MIME type from the file signature.
+
+    Only the first 16 base64 characters (12 bytes) are decoded, which is
+    enough for the PNG, JPEG, GIF and WebP signatures.
+
+    Args:
+        base64_str: Base64 encoded image data without data URL prefix
+        default: Default MIME type if the signature is not recognised
+
+    Returns:
+        MIME type string
+    """
+    try:
+        header = b64decode(base64_str[:16])
+    except ValueError:
+        return default
+
+    return _signature_mime(header) or default
+
+
+def _signature_mime(header: bytes) -> Optional[str]:
+    """MIME type for a PNG, JPEG, GIF or WebP signature in the first 12 bytes."""
+    if header[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if header[:2] == b"\xff\xd8":
+        return "image/jpeg"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
 
 
 def extract_mime_type(base64_str: str, default: str = "image/png") -> str:
@@ -71,14 +161,7 @@ def extract_mime_type(base64_str: str, default: str = "image/png") -> str:
     Returns:
         MIME type string
     """
-    if base64_str.startswith("data:"):
-        # Format: data:image/png;base64,xxxxx
-        prefix = base64_str.split(",", 1)[0]
-        if ";" in prefix:
-            mime_part = prefix.split(";")[0]
-            return mime_part.replace("data:", "")
-
-    return default
+    return split_data_url(base64_str)[0] or default
 
 
 def create_data_url(base64_str: str, mime_type: str = "image/png") -> str:
@@ -110,29 +193,17 @@ def validate_image_data(base64_str: str) -> bool:
         True if valid, False otherwise
     """
     try:
-        data = decode_base64_to_bytes(base64_str)
+        # The signatures sit in the first 12 bytes, so only the first 24
+        # base64 characters (18 bytes) are decoded, never the whole image
+        payload = strip_data_url(base64_str)
+        try:
+            data = b64decode(payload[:24])
+        except ValueError:
+            # Whitespace or padding inside the prefix; decode it all
+            data = b64decode(payload)
 
         # Check for common image file signatures
-        if len(data) < 8:
-            return False
-
-        # PNG signature
-        if data[:8] == b"\x89PNG\r\n\x1a\n":
-            return True
-
-        # JPEG signature (SOI marker)
-        if data[:2] == b"\xff\xd8":
-            return True
-
-        # GIF signature
-        if data[:6] in (b"GIF87a", b"GIF89a"):
-            return True
-
-        # WebP signature
-        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
-            return True
-
-        return False
+        return len(data) >= 8 and _signature_mime(data) is not None
 
     except Exception:
         return False
@@ -156,13 +227,18 @@ def resize_image_if_needed(
     Returns:
         Tuple of (image_bytes, was_resized)
     """
-    try:
-        from PIL import Image
-    except ImportError:
+    # Most reference images are already small enough; the header says so
+    # without decoding a pixel
+    size = _header_dimensions(image_bytes)
+    if size is not None and size[0] <= max_size and size[1] <= max_size:
+        return image_bytes, False
+
+    pil_image = _pil_image()
+    if pil_image is None:
         return image_bytes, False
 
     # Load image
-    img = Image.open(io.BytesIO(image_bytes))
+    img = pil_image.open(io.BytesIO(image_bytes))
 
     # Check if resize is needed
     width, height = img.size
@@ -177,8 +253,10 @@ def resize_image_if_needed(
         new_height = max_size
         new_width = int(width * (max_size / height))
 
-    # Resize
-    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # Resize. With reducing_gap, Pillow first shrinks by an integer factor
+    # with reduce() (box averaging) while the image stays at least 3x the
+    # target, so Lanczos only runs over the remaining small step.
+    img = img.resize((new_width, new_height), pil_image.Resampling.LANCZOS, reducing_gap=3.0)
 
     # Save to bytes
     output = io.BytesIO()
@@ -197,33 +275,109 @@ def get_image_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
     """
     Get dimensions of an image from its bytes.
 
+    PNG, GIF, WebP and JPEG sizes are read straight from the file header;
+    Pillow is only consulted for other formats.
+
     Args:
         image_bytes: Image data as bytes
 
     Returns:
         Tuple of (width, height) or None if cannot determine
     """
+    size = _header_dimensions(image_bytes)
+    if size is not None:
+        return size
+
+    pil_image = _pil_image()
+    if pil_image is None:
+        return None
+
     try:
-        from PIL import Image
+        return pil_image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        return None
+
 
-        img = Image.open(io.BytesIO(image_bytes))
-        return img.size
+@lru_cache(maxsize=1)
+def _pil_image() -> Any:
+    """
+    PIL.Image, or None if Pillow is not installed.
+
+    Imported on first use rather than at module import, so the header-only
+    paths never load Pillow; the result is cached either way.
+    """
+    try:
+        from PIL import Image
     except ImportError:
-        pass
-    except Exception:
-        pass
+        return None
+    return Image
+
+
+# JPEG start-of-frame markers; C4, C8 and CC share the range but are not frames
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
 
-    # Fallback: try to parse PNG/JPEG headers manually
+
+def _header_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from a PNG, GIF, WebP or JPEG header.
+
+    Fields are unpacked in place with struct.unpack_from, so no slices of
+    the image are copied. Returns None for other formats and for
+    truncated headers.
+    """
     try:
-        # PNG
-        if image_bytes[:8] == b"\x89PNG\r\n\x1a\n":
-            # Width and height are at bytes 16-23 in IHDR chunk
-            width = int.from_bytes(image_bytes[16:20], "big")
-            height = int.from_bytes(image_bytes[20:24], "big")
-            return (width, height)
-
-        # JPEG - more complex, skip for now
+        return _parse_header_dimensions(data)
+    except struct.error:
         return None
 
-    except Exception:
+
+def _parse_header_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Body of _header_dimensions; raises struct.error on a short header."""
+    # PNG: IHDR is always the first chunk
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        return struct.unpack_from(">II", data, 16)
+
+    # GIF: logical screen size, little-endian
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack_from("<HH", data, 6)
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            # Lossy: 14-bit sizes after the 9d 01 2a frame start code
+            width, height = struct.unpack_from("<HH", data, 26)
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            # Lossless: 14-bit (size - 1) fields packed after the 0x2f signature
+            (bits,) = struct.unpack_from("<I", data, 21)
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            # Extended: 24-bit (canvas size - 1) fields at offsets 24 and 27
+            (width,) = struct.unpack_from("<I", data, 24)
+            (height,) = struct.unpack_from("<I", data, 26)
+            return (width & 0xFFFFFF) + 1, (height >> 8) + 1
+        return None
+
+    # JPEG: walk the marker segments up to the start-of-frame
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 4 <= len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:
+                # Fill byte before a marker
+                i += 1
+                continue
+            if marker in _JPEG_SOF_MARKERS:
+                height, width = struct.unpack_from(">HH", data, i + 5)
+                return width, height
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                # Standalone markers carry no length
+                i += 2
+                continue
+            (length,) = struct.unpack_from(">H", data, i + 2)
+            i += 2 + length
         return None
+
+    return None
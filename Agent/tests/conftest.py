@@ -6,19 +6,8 @@ import pytest
 import asyncio
 from typing import AsyncGenerator
 
-
-@pytest.fixture(scope="session")
-def event_loop():
-    """Create an event loop for async tests."""
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
-
-
-@pytest.fixture
-def sample_shader_code():
-    """Provide sample shader code for testing."""
-    return """Shader "Custom/TestShader"
+# Fixture data, built once per session. Tests must not mutate it.
+SAMPLE_SHADER_CODE = """Shader "Custom/TestShader"
 {
     Properties
     {
@@ -76,7 +65,21 @@ def sample_shader_code():
 }"""
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an event loop for async tests."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def sample_shader_code():
+    """Provide sample shader code for testing."""
+    return SAMPLE_SHADER_CODE
+
+
+@pytest.fixture(scope="session")
 def sample_session_init_message():
     """Provide sample SESSION_INIT message."""
     return {
@@ -91,7 +94,7 @@ def sample_session_init_message():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_user_message():
     """Provide sample USER_MESSAGE."""
     return {
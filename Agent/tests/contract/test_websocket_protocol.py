@@ -5,6 +5,7 @@ Tests that messages conform to the defined protocol specification.
 
 import pytest
 import json
+from shader_copilot.server.message_handler import serialize_message
 from shader_copilot.server.messages import (
     MessageType,
     ServerMessageType,
@@ -110,9 +111,8 @@ class TestServerToClientMessages:
         assert msg["session_id"] == "sess-abc123"
         assert "content" in msg["payload"]
 
-        # Verify JSON serializable
-        json_str = json.dumps(msg)
-        parsed = json.loads(json_str)
+        # Verify it serializes the way the server sends it
+        parsed = json.loads(serialize_message(msg))
         assert parsed["type"] == "RESPONSE"
 
     def test_stream_chunk_contract(self):
@@ -244,8 +244,7 @@ class TestMessageSerializationRoundtrip:
             code=shader_code,
         )
 
-        json_str = json.dumps(msg)
-        parsed = json.loads(json_str)
+        parsed = json.loads(serialize_message(msg))
 
         assert len(parsed["payload"]["code"]) == len(shader_code)
 
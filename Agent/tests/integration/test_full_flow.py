@@ -15,80 +15,20 @@ from unittest.mock import AsyncMock, MagicMock, patch
 # =============================================================================
 
 
-@pytest.fixture
+# Minimal 1x1 red PNG, encoded once at import
+_PNG_1X1 = (
+    b"\x89PNG\r\n\x1a\n"  # PNG signature
+    b"\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde"
+    b"\x00\x00\x00\x0cIDAT\x08\xd7c\xf8\xcf\xc0\x00\x00\x01\xa0\x01\x00"
+    b"\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+_PNG_1X1_BASE64 = base64.b64encode(_PNG_1X1).decode("utf-8")
+
+
+@pytest.fixture(scope="session")
 def sample_image_base64():
     """Generate a minimal valid PNG image in base64."""
-    # Minimal 1x1 red PNG
-    png_bytes = bytes(
-        [
-            0x89,
-            0x50,
-            0x4E,
-            0x47,
-            0x0D,
-            0x0A,
-            0x1A,
-            0x0A,  # PNG signature
-            0x00,
-            0x00,
-            0x00,
-            0x0D,  # IHDR length
-            0x49,
-            0x48,
-            0x44,
-            0x52,  # IHDR
-            0x00,
-            0x00,
-            0x00,
-            0x01,  # width
-            0x00,
-            0x00,
-            0x00,
-            0x01,  # height
-            0x08,
-            0x02,  # bit depth, color type
-            0x00,
-            0x00,
-            0x00,  # compression, filter, interlace
-            0x90,
-            0x77,
-            0x53,
-            0xDE,  # CRC
-            0x00,
-            0x00,
-            0x00,
-            0x0C,  # IDAT length
-            0x49,
-            0x44,
-            0x41,
-            0x54,  # IDAT
-            0x08,
-            0xD7,
-            0x63,
-            0xF8,
-            0xCF,
-            0xC0,
-            0x00,
-            0x00,
-            0x01,
-            0xA0,
-            0x01,
-            0x00,  # IDAT CRC
-            0x00,
-            0x00,
-            0x00,
-            0x00,  # IEND length
-            0x49,
-            0x45,
-            0x4E,
-            0x44,  # IEND
-            0xAE,
-            0x42,
-            0x60,
-            0x82,  # IEND CRC
-        ]
-    )
-    return base64.b64encode(png_bytes).decode("utf-8")
+    return _PNG_1X1_BASE64
 
 
 @pytest.fixture
@@ -191,6 +131,7 @@ class TestUS1TextToShader:
         ) as mock_manager:
             manager = MagicMock()
             manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -219,6 +160,7 @@ class TestUS1TextToShader:
         ) as mock_manager:
             manager = MagicMock()
             manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -235,6 +177,67 @@ class TestUS1TextToShader:
                 or result.get("is_complete") == True
             )
 
+    @pytest.mark.asyncio
+    async def test_runner_resumes_after_compile(self, mock_llm_response):
+        """Test that the runner resumes the graph with compile tool results."""
+        from shader_copilot.graphs.shader_gen.graph import ShaderGenRunner
+
+        compile_results = [
+            {"status": "failed", "errors": [{"line": 12, "message": "syntax error"}]},
+            {"status": "success", "shader_id": "abc"},
+        ]
+        tool_calls = []
+
+        async def on_tool_call(tool_name, args):
+            tool_calls.append((tool_name, args["shader_name"]))
+            return compile_results.pop(0)
+
+        with patch(
+            "shader_copilot.graphs.shader_gen.nodes.get_model_manager"
+        ) as mock_manager:
+            manager = MagicMock()
+            manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
+            mock_manager.return_value = manager
+
+            state = await ShaderGenRunner().run(
+                "Create a simple toon shader",
+                session_id="test",
+                on_tool_call=on_tool_call,
+            )
+
+        assert state.is_complete
+        assert state.retry_count == 1
+        assert state.compile_result.shader_id == "abc"
+        assert tool_calls == [("compile_shader", "Custom/ToonShader")] * 2
+
+    @pytest.mark.asyncio
+    async def test_runner_fails_after_max_retries(self, mock_llm_response):
+        """Test that exhausted retries finish with the formatted errors."""
+        from shader_copilot.graphs.shader_gen.graph import ShaderGenRunner
+
+        async def on_tool_call(tool_name, args):
+            return {"status": "failed", "errors": [{"line": 7, "message": "bad"}]}
+
+        with patch(
+            "shader_copilot.graphs.shader_gen.nodes.get_model_manager"
+        ) as mock_manager:
+            manager = MagicMock()
+            manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
+            mock_manager.return_value = manager
+
+            state = await ShaderGenRunner().run(
+                "Create a simple toon shader",
+                session_id="test",
+                max_retries=1,
+                on_tool_call=on_tool_call,
+            )
+
+        assert state.is_complete
+        assert state.current_stage == "failed"
+        assert "line 7: bad" in state.error
+
 
 # =============================================================================
 # US2: Image-to-Shader Flow
@@ -258,6 +261,7 @@ class TestUS2ImageToShader:
             manager = MagicMock()
             # Return mock_llm_response for all generate calls (image analysis, requirement analysis, shader gen)
             manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -291,6 +295,7 @@ class TestUS2ImageToShader:
             manager = MagicMock()
             # Return mock_llm_response for all generate calls
             manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -336,6 +341,7 @@ class TestUS3IterativeRefinement:
         ) as mock_manager:
             manager = MagicMock()
             manager.generate = AsyncMock(return_value=modified_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -370,6 +376,7 @@ User: Add some color"""
         ) as mock_manager:
             manager = MagicMock()
             manager.generate = AsyncMock(return_value=mock_llm_response)
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -561,6 +568,7 @@ class TestErrorHandling:
         ) as mock_manager:
             manager = MagicMock()
             manager.generate = AsyncMock(side_effect=Exception("API Error"))
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -591,6 +599,7 @@ class TestErrorHandling:
             manager.generate = AsyncMock(
                 return_value="Cannot generate without requirements"
             )
+            manager.stream.side_effect = NotImplementedError  # generate only
             mock_manager.return_value = manager
 
             graph = create_shader_gen_graph()
@@ -314,6 +314,34 @@ I analyzed the image and found the following visual style:
         assert state.image_analysis is not None
         assert "rim lighting" in state.image_analysis
 
+    @pytest.mark.asyncio
+    async def test_image_analysis_cache_keys_on_requirement(
+        self, mock_vl_model, sample_image_base64
+    ):
+        """Test that cached analyses are reused only for the same requirement."""
+        from shader_copilot.graphs.shader_gen import nodes
+        from shader_copilot.graphs.shader_gen.state import ShaderGenState
+
+        def make_state(requirement):
+            return ShaderGenState(
+                user_requirement=requirement,
+                session_id="test-123",
+                reference_image_b64=sample_image_base64,
+                reference_image_mime="image/png",
+            )
+
+        with patch.dict(nodes._image_analysis_cache, clear=True), patch(
+            "shader_copilot.graphs.shader_gen.nodes.get_model_manager",
+            return_value=mock_vl_model,
+        ):
+            await nodes.analyze_image(make_state("Make it glow"))
+            hit = await nodes.analyze_image(make_state("Make it glow"))
+            assert mock_vl_model.generate.await_count == 1
+            assert "image_url_cache" not in hit
+
+            await nodes.analyze_image(make_state("Make it dissolve"))
+            assert mock_vl_model.generate.await_count == 2
+
     def test_image_message_payload(self, sample_image_base64):
         """Test message payload with image data."""
         from shader_copilot.server.messages import UserMessagePayload
@@ -211,3 +211,68 @@ class TestShaderGenGraphNodes:
         assert (
             has_fragment_pragma == False
         ), "Invalid shader should not have #pragma fragment"
+
+
+class TestGenerateCode:
+    """Tests for streamed code generation."""
+
+    @staticmethod
+    def make_manager(chunks, error=None):
+        """Create a manager whose stream is a real async generator."""
+        manager = MagicMock()
+        manager.generate = AsyncMock(return_value="full response")
+        manager.consumed = []
+
+        async def stream(messages, role):
+            for chunk in chunks:
+                manager.consumed.append(chunk)
+                yield chunk
+            if error is not None:
+                raise error
+
+        manager.stream = stream
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_stream_stops_after_closing_fence(self):
+        """Test that streaming ends at the closing fence, even one split across chunks."""
+        from shader_copilot.graphs.shader_gen.nodes import generate_code
+
+        chunks = ["Here:\n`", "``hlsl\nShader \"A\" {}\n", "`", "``", "\nMore text", " after"]
+        manager = self.make_manager(chunks)
+
+        result = await generate_code(manager, [])
+
+        assert result == 'Here:\n```hlsl\nShader "A" {}\n```'
+        assert manager.consumed == chunks[:4]
+        manager.generate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_without_fence_is_read_to_the_end(self):
+        """Test that an unfenced response is returned whole."""
+        from shader_copilot.graphs.shader_gen.nodes import generate_code
+
+        manager = self.make_manager(['Shader "A"\n', "{ ``` }\n", "}"])
+
+        assert await generate_code(manager, []) == 'Shader "A"\n{ ``` }\n}'
+        manager.generate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_streaming_unsupported(self):
+        """Test that a model that can't stream uses a regular generate call."""
+        from shader_copilot.graphs.shader_gen.nodes import generate_code
+
+        manager = self.make_manager([], error=NotImplementedError())
+
+        assert await generate_code(manager, []) == "full response"
+
+    @pytest.mark.asyncio
+    async def test_stream_error_is_not_retried(self):
+        """Test that a failure mid-stream propagates instead of generating again."""
+        from shader_copilot.graphs.shader_gen.nodes import generate_code
+
+        manager = self.make_manager(["```hlsl\n"], error=ConnectionError("dropped"))
+
+        with pytest.raises(ConnectionError):
+            await generate_code(manager, [])
+        manager.generate.assert_not_called()
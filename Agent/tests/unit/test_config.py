@@ -0,0 +1,80 @@
+"""
+Unit tests for configuration loading.
+"""
+
+import logging
+
+import pytest
+
+from shader_copilot.models import config
+from shader_copilot.models.config import LLMConfig, LogConfig, ServerConfig
+
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    """Point the loader at an empty .env file in a temporary directory."""
+    path = tmp_path / ".env"
+    path.write_text("", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    config.reload_config()
+    yield path
+    config.reload_config()
+
+
+class TestEnvConfig:
+    """Tests for reading config fields from the environment."""
+
+    def test_direct_construction_reads_environment(self, env_file, monkeypatch):
+        """Test that constructing a config picks up environment variables."""
+        monkeypatch.setenv("LLM_API_KEY", "sk-test")
+        monkeypatch.setenv("WEBSOCKET_PORT", "9000")
+
+        assert LLMConfig().api_key == "sk-test"
+        assert ServerConfig().port == 9000
+
+    def test_names_match_case_insensitively(self, env_file, monkeypatch):
+        """Test that variable names are matched regardless of case."""
+        env_file.write_text("code_model=from-file\n", encoding="utf-8")
+        config.reload_config()
+        monkeypatch.setenv("llm_api_base", "http://localhost:1234/v1")
+
+        llm = LLMConfig()
+
+        assert llm.code_model == "from-file"
+        assert llm.api_base == "http://localhost:1234/v1"
+
+    def test_precedence(self, env_file, monkeypatch):
+        """Test that arguments beat the environment, which beats the .env file."""
+        env_file.write_text("ROUTER_MODEL=file\nVL_MODEL=file\n", encoding="utf-8")
+        config.reload_config()
+        monkeypatch.setenv("ROUTER_MODEL", "env")
+        monkeypatch.setenv("VL_MODEL", "env")
+
+        llm = LLMConfig(VL_MODEL="arg")
+
+        assert llm.router_model == "env"
+        assert llm.vl_model == "arg"
+
+
+class TestSetupLogging:
+    """Tests for the buffered log file handler."""
+
+    @pytest.fixture
+    def log_file(self, tmp_path):
+        """Configure logging to a temporary file and restore it afterwards."""
+        path = tmp_path / "agent.log"
+        config.setup_logging(LogConfig(LOG_LEVEL="INFO", LOG_FILE=str(path)))
+        yield path
+        config.setup_logging(LogConfig(LOG_LEVEL="INFO", LOG_FILE=None))
+
+    def test_warnings_are_written_immediately(self, log_file):
+        """Test that a warning flushes the buffered records to the file."""
+        logger = logging.getLogger("shader_copilot.test")
+
+        logger.info("buffered")
+        assert "buffered" not in log_file.read_text(encoding="utf-8")
+
+        logger.warning("flushed")
+        text = log_file.read_text(encoding="utf-8")
+        assert "buffered" in text
+        assert "flushed" in text
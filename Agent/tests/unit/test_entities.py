@@ -0,0 +1,71 @@
+"""
+Unit tests for entity models.
+"""
+
+from shader_copilot.models.entities import (
+    MessageRole,
+    Session,
+    SessionIndex,
+    SessionIndexAdapter,
+)
+
+
+class TestSessionIndex:
+    """Tests for SessionIndex."""
+
+    def test_add_session_keeps_most_recent_first(self):
+        """Test that re-adding a session moves it to the front."""
+        index = SessionIndex()
+        first = Session()
+        second = Session()
+
+        index.add_session(first)
+        index.add_session(second)
+        index.add_session(first)
+
+        assert [s.session_id for s in index.sessions] == [
+            first.session_id,
+            second.session_id,
+        ]
+
+    def test_remove_session(self):
+        """Test removing a session, including unknown ids."""
+        index = SessionIndex()
+        session = Session()
+        index.add_session(session)
+
+        index.remove_session(session.session_id)
+        index.remove_session(session.session_id)
+
+        assert index.sessions == []
+
+    def test_json_round_trip(self):
+        """Test that the index serializes as a sessions list and back."""
+        index = SessionIndex()
+        session = Session()
+        session.add_message(MessageRole.USER, "Make a toon shader")
+        index.add_session(session)
+        index.add_session(Session())
+
+        restored = SessionIndexAdapter.validate_json(SessionIndexAdapter.dump_json(index))
+
+        assert restored.sessions == index.sessions
+        assert restored.sessions[1].preview_message == "Make a toon shader"
+
+    def test_sessions_list_can_be_edited_directly(self):
+        """Test that add_session stays correct after the list is replaced or appended to."""
+        index = SessionIndex()
+        first = Session()
+        second = Session()
+        index.add_session(first)
+        summary = index.sessions[0]
+
+        index.sessions = []
+        index.sessions.append(summary)
+        index.add_session(second)
+        index.add_session(first)
+
+        assert [s.session_id for s in index.sessions] == [
+            first.session_id,
+            second.session_id,
+        ]
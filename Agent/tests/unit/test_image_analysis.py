@@ -199,6 +199,52 @@ Based on the image analysis, I can identify the following visual characteristics
         assert data_url.startswith("data:image/png;base64,")
         assert len(data_url) > len("data:image/png;base64,")
 
+    def test_sniff_image_mime_from_header(self, sample_image_base64):
+        """Test MIME detection from the base64 header only."""
+        from shader_copilot.utils.image_utils import sniff_image_mime
+
+        jpeg_base64 = base64.b64encode(b"\xff\xd8\xff\xe0" + b"\x00" * 12).decode()
+
+        assert sniff_image_mime(sample_image_base64) == "image/png"
+        assert sniff_image_mime(jpeg_base64) == "image/jpeg"
+        assert sniff_image_mime("!!!!", default="image/webp") == "image/webp"
+
+    def test_validate_image_data_from_header(self, sample_image_base64):
+        """Test validation against the signature in the decoded prefix."""
+        from shader_copilot.utils.image_utils import validate_image_data
+
+        webp_base64 = base64.b64encode(b"RIFF\x00\x00\x00\x00WEBPVP8 ").decode()
+
+        assert validate_image_data(sample_image_base64)
+        assert validate_image_data(f"data:image/png;base64,{sample_image_base64}")
+        assert validate_image_data(webp_base64)
+        assert not validate_image_data(base64.b64encode(b"\xff\xd8\xff").decode())
+        assert not validate_image_data(base64.b64encode(b"not an image").decode())
+
+    def test_get_image_dimensions_from_header(self, sample_image_base64):
+        """Test reading image sizes from PNG and JPEG headers."""
+        import struct
+
+        from shader_copilot.utils.image_utils import get_image_dimensions
+
+        jpeg_bytes = (
+            b"\xff\xd8"
+            + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+            + b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 600, 800) + b"\x00" * 12
+        )
+
+        assert get_image_dimensions(base64.b64decode(sample_image_base64)) == (1, 1)
+        assert get_image_dimensions(jpeg_bytes) == (800, 600)
+
+    def test_strip_data_url(self, sample_image_base64):
+        """Test that the data URL prefix is removed without decoding."""
+        from shader_copilot.utils.image_utils import strip_data_url
+
+        data_url = f"data:image/png;base64,{sample_image_base64}"
+
+        assert strip_data_url(data_url) == sample_image_base64
+        assert strip_data_url(sample_image_base64) == sample_image_base64
+
 
 class TestImageToShaderFlow:
     """Tests for the complete image-to-shader flow."""
@@ -2,6 +2,8 @@
 Unit tests for WebSocket message parsing and handling.
 """
 
+import json
+
 import pytest
 from shader_copilot.server.messages import (
     MessageType,
@@ -215,3 +217,106 @@ class TestMessageValidation:
         msg = parse_message(raw)
         # Should have empty or None content
         assert msg is not None
+
+
+class TestMessageHandlerParsing:
+    """Tests for MessageHandler envelope decoding."""
+
+    def test_parse_raw_json(self):
+        """Test decoding a raw JSON envelope from str or bytes."""
+        from shader_copilot.server.message_handler import MessageHandler
+
+        raw = '{"type": "USER_MESSAGE", "payload": {"content": "创建着色器"}}'
+        handler = MessageHandler()
+
+        for data in (raw, raw.encode()):
+            msg = handler.parse_message(data)
+            assert msg.type == MessageType.USER_MESSAGE
+            assert msg.payload["content"] == "创建着色器"
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("{not json", "Invalid JSON"),
+            ('{"payload": {}}', "Missing 'type' field"),
+            ('{"type": 42}', "Invalid message structure"),
+        ],
+    )
+    def test_parse_errors(self, raw, expected):
+        """Test that malformed envelopes raise MessageParseError."""
+        from shader_copilot.server.message_handler import MessageHandler, MessageParseError
+
+        with pytest.raises(MessageParseError, match=expected):
+            MessageHandler().parse_message(raw)
+
+    @pytest.mark.asyncio
+    async def test_ping_returns_pong_frame(self):
+        """Test that the pre-serialized PONG frame is a valid envelope."""
+        from shader_copilot.server.message_handler import MessageHandler, serialize_message
+        from shader_copilot.server.messages import BaseMessage
+
+        response = await MessageHandler().handle_message('{"type": "ping", "payload": {}}')
+        pong = BaseMessage.model_validate_json(serialize_message(response))
+
+        assert pong.type == ServerMessageType.PONG
+        assert pong.payload == {}
+
+    def test_serialize_factory_dict(self):
+        """Test that factory dicts serialize without a BaseMessage round trip."""
+        from shader_copilot.server.message_handler import serialize_message
+        from shader_copilot.server.messages import create_stream_chunk
+
+        frame = serialize_message(create_stream_chunk("session-1", "Hello", is_final=True))
+
+        assert json.loads(frame) == {
+            "type": "STREAM_CHUNK",
+            "session_id": "session-1",
+            "payload": {"content": "Hello", "is_final": True},
+        }
+
+    def test_stream_chunk_frame_round_trips(self):
+        """Test that the templated STREAM_CHUNK frame is a valid envelope."""
+        from shader_copilot.server.message_handler import serialize_stream_chunk
+        from shader_copilot.server.messages import BaseMessage
+
+        content = 'Shader "Custom/Toon"\n{\t// ✓'
+        chunk = BaseMessage.model_validate_json(serialize_stream_chunk(content, is_final=True))
+
+        assert chunk.type == ServerMessageType.STREAM_CHUNK
+        assert chunk.payload == {"content": content, "is_final": True}
+        assert chunk.timestamp.tzinfo is not None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "raw,code",
+        [
+            ("not json", "PARSE_ERROR"),
+            ('{"type": "bogus", "payload": {}}', "UNKNOWN_MESSAGE_TYPE"),
+            ('{"type": "SESSION_END", "payload": {}}', "NO_HANDLER"),
+        ],
+    )
+    async def test_connection_errors_are_error_frames(self, raw, code):
+        """Test that connection-level failures produce valid ERROR envelopes."""
+        from shader_copilot.server.message_handler import MessageHandler, serialize_message
+        from shader_copilot.server.messages import BaseMessage
+
+        response = await MessageHandler().handle_message(raw)
+        error = BaseMessage.model_validate_json(serialize_message(response))
+
+        assert error.type == ServerMessageType.ERROR
+        assert error.payload["code"] == code
+        assert error.payload["recoverable"] is True
+
+    def test_invalid_payload_reports_received_frame(self):
+        """Test that payload errors carry the frame exactly as received."""
+        from shader_copilot.server.message_handler import MessageHandler, MessageParseError
+        from shader_copilot.server.messages import ConfirmResponsePayload
+
+        handler = MessageHandler()
+        raw = b'{"type": "CONFIRM_RESPONSE", "payload": {"approved": true}}'
+        message = handler.parse_message(raw)
+
+        with pytest.raises(MessageParseError) as exc_info:
+            handler.validate_payload(message, ConfirmResponsePayload)
+
+        assert exc_info.value.raw_data == raw
@@ -5,6 +5,7 @@ Unit tests for session manager.
 import json
 import tempfile
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -110,6 +111,16 @@ class TestSession:
         assert history[1].compile_success is False
         assert history[2].compile_success is True
 
+    def test_loaded_history_is_not_duplicated(self):
+        """Test that a loaded session's current shader isn't re-archived."""
+        session = Session(session_id="test-123")
+        session.set_current_shader('Shader "V1" {}')
+        loaded = Session.from_dict(session.to_dict())
+
+        loaded.set_current_shader('Shader "V2" {}')
+
+        assert [v.name for v in loaded.shader_history] == ["V1", "V2"]
+
     def test_set_property(self):
         """Test setting user properties."""
         session = Session(session_id="test-123")
@@ -150,6 +161,17 @@ class TestSession:
         assert "Message 19" in context
         assert "Message 0" not in context
 
+    def test_build_context_after_new_message(self):
+        """Test that a cached context picks up newly added messages."""
+        session = Session(session_id="test-123")
+        session.add_message("user", "Make a toon shader")
+        session.build_context()
+
+        session.add_message("assistant", "Here it is")
+
+        assert session.build_context() == "User: Make a toon shader\n\nAssistant: Here it is"
+        assert session.build_context(max_messages=1) == "Assistant: Here it is"
+
     def test_to_dict(self):
         """Test serialization to dict."""
         session = Session(session_id="test-123")
@@ -180,6 +202,17 @@ class TestSession:
         assert session.preview_object == "Cube"
         assert session.properties["_Color"] == "(1,1,1,1)"
 
+    def test_json_round_trip(self):
+        """Test serialization to JSON and back."""
+        session = Session(session_id="test-789")
+        session.add_message("user", "Make it glow ✓", source="editor")
+        session.set_current_shader('Shader "Glow" {}')
+
+        data = session.to_json()
+
+        assert json.loads(data) == session.to_dict()
+        assert Session.from_json(data) == session
+
 
 class TestSessionManager:
     """Tests for SessionManager."""
@@ -360,6 +393,151 @@ class TestSessionPersistence:
 
         assert not (temp_storage / "delete-stored.json").exists()
 
+    def test_incremental_save_round_trip(self, temp_storage):
+        """Test that later saves append to the log and load back in full."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("logged")
+        session.add_message("user", "Make a toon shader")
+        manager.save_session("logged")
+        snapshot = (temp_storage / "logged.json").read_bytes()
+
+        session.add_message("assistant", "Here it is")
+        session.set_current_shader('Shader "Custom/Toon" {}')
+        session.set_property("_Color", "(1,0,0,1)")
+        manager.save_session("logged")
+        with open(temp_storage / "logged.jsonl", "ab") as f:
+            f.write(b'{"type": "mess')  # torn write
+
+        assert (temp_storage / "logged.json").read_bytes() == snapshot
+        assert SessionManager(storage_path=temp_storage).get_session("logged") == session
+
+        manager.compact_session("logged")
+
+        assert not (temp_storage / "logged.jsonl").exists()
+        assert SessionManager(storage_path=temp_storage).get_session("logged") == session
+
+    def test_save_after_torn_write_keeps_events(self, temp_storage):
+        """Test that events appended after a torn line are not lost."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("s1")
+        session.add_message("user", "one")
+        manager.save_session("s1")
+        session.add_message("assistant", "two")
+        manager.save_session("s1")
+        with open(temp_storage / "s1.jsonl", "ab") as f:
+            f.write(b'{"type":"message","da')  # torn write
+
+        session.add_message("user", "three")
+        manager.save_session("s1")
+        session.add_message("assistant", "four")
+        manager.save_session("s1")
+
+        loaded = SessionManager(storage_path=temp_storage).get_session("s1")
+        assert [m.content for m in loaded.messages] == ["one", "two", "three", "four"]
+
+    def test_log_older_than_snapshot_is_not_replayed(self, temp_storage):
+        """Test that a log left by a crash during compaction isn't applied twice."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("s1")
+        session.add_message("user", "one")
+        manager.save_session("s1")
+        session.add_message("assistant", "two")
+        manager.save_session("s1")
+        old_log = (temp_storage / "s1.jsonl").read_bytes()
+
+        manager.compact_session("s1")
+        (temp_storage / "s1.jsonl").write_bytes(old_log)  # crash before the unlink
+
+        loaded = SessionManager(storage_path=temp_storage).get_session("s1")
+        assert [m.content for m in loaded.messages] == ["one", "two"]
+
+        session.add_message("user", "three")
+        manager.save_session("s1")
+        loaded = SessionManager(storage_path=temp_storage).get_session("s1")
+        assert [m.content for m in loaded.messages] == ["one", "two", "three"]
+
+    def test_append_event_rejects_invalid_events(self, temp_storage):
+        """Test that a malformed event is refused instead of breaking the load."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("a")
+        session.add_message("user", "one")
+        manager.save_session("a")
+
+        with pytest.raises(ValueError):
+            manager.append_event("a", {"kind": "note"})
+        with pytest.raises(ValueError):
+            manager.append_event("a", {"type": "message", "data": {"role": "user"}})
+        assert manager.append_event("a", {"type": "state", "data": {"preview_object": "Cube"}})
+
+        loaded = SessionManager(storage_path=temp_storage).get_session("a")
+        assert [m.content for m in loaded.messages] == ["one"]
+        assert loaded.preview_object == "Cube"
+
+    def test_invalid_log_lines_are_skipped(self, temp_storage):
+        """Test that unknown or invalid logged events don't fail the whole load."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("a")
+        session.add_message("user", "one")
+        manager.save_session("a")
+        session.add_message("assistant", "two")
+        manager.save_session("a")
+        with open(temp_storage / "a.jsonl", "ab") as f:
+            f.write(b'{"kind": "note"}\n{"type": "shader", "data": {"name": 1}}\n')
+
+        loaded = SessionManager(storage_path=temp_storage).get_session("a")
+        assert [m.content for m in loaded.messages] == ["one", "two"]
+
+    def test_failed_append_falls_back_to_snapshot(self, temp_storage):
+        """Test that a partly written append is not repeated by the next save."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("s1")
+        session.add_message("user", "one")
+        manager.save_session("s1")
+        session.add_message("assistant", "two")
+
+        def partial_write(path, data, header):
+            with open(path, "ab") as f:
+                f.write(data)
+            raise OSError("disk full")
+
+        with patch(
+            "shader_copilot.session.session_manager._append_lines",
+            side_effect=partial_write,
+        ):
+            assert manager.save_session("s1") is False
+
+        assert manager.save_session("s1") is True
+        assert not (temp_storage / "s1.jsonl").exists()
+        loaded = SessionManager(storage_path=temp_storage).get_session("s1")
+        assert [m.content for m in loaded.messages] == ["one", "two"]
+
+    @pytest.mark.asyncio
+    async def test_async_save_and_load(self, temp_storage):
+        """Test saving and loading off the event loop."""
+        manager = SessionManager(storage_path=temp_storage)
+        session = manager.create_session("async")
+        session.add_message("user", "Make a toon shader")
+
+        assert await manager.asave_session("async") is True
+        session.add_message("assistant", "Here it is")
+        assert await manager.asave_session("async") is True
+
+        loaded = await SessionManager(storage_path=temp_storage).aget_session("async")
+        assert loaded == session
+
+    def test_list_sessions_tracks_save_and_delete(self, temp_storage):
+        """Test that listing follows saves and deletes without rescanning."""
+        manager = SessionManager(storage_path=temp_storage)
+        manager.create_session("kept")
+        manager.save_session("kept")
+        manager.create_session("dropped")
+        manager.save_session("dropped")
+
+        manager.delete_session("dropped")
+
+        assert SessionManager(storage_path=temp_storage).list_sessions() == ["kept"]
+        assert manager.list_sessions() == ["kept"]
+
 
 class TestGlobalSessionManager:
     """Tests for global session manager."""
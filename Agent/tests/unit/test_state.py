@@ -0,0 +1,114 @@
+"""
+Unit tests for the shared session state.
+"""
+
+from shader_copilot.graphs.base.state import (
+    DEFAULT_CONTEXT_MESSAGES,
+    MAX_HISTORY_CHARS,
+    SUMMARY_SNIPPET_CHARS,
+    MessageRole,
+    SessionState,
+)
+
+
+def _fill(state: SessionState, count: int, size: int) -> None:
+    """Add alternating user/assistant messages of ``size`` characters."""
+    for i in range(count):
+        role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+        state.add_message(role, f"{i:04d}" + "x" * (size - 4))
+
+
+class TestHistoryCompaction:
+    """Tests for folding old history into a summary message."""
+
+    def test_history_under_budget_is_kept(self):
+        """Test that nothing is compacted up to the character budget."""
+        state = SessionState()
+        _fill(state, 8, MAX_HISTORY_CHARS // 8)
+
+        assert len(state.conversation_history) == 8
+        assert state._history_chars == MAX_HISTORY_CHARS
+
+    def test_oldest_half_folded_into_summary(self):
+        """Test that exceeding the budget folds the oldest half into one SYSTEM message."""
+        state = SessionState()
+        _fill(state, 8, MAX_HISTORY_CHARS // 8)
+        kept = state.conversation_history[4:]
+
+        last = state.add_message(MessageRole.USER, "one more")
+
+        summary, *rest = state.conversation_history
+        assert rest == [*kept, last]
+        assert summary.role == MessageRole.SYSTEM
+        assert summary.metadata == {"summary": True}
+        lines = summary.content.splitlines()
+        assert lines[0] == "Summary of earlier conversation:"
+        assert lines[1] == f"- user: 0000{'x' * (SUMMARY_SNIPPET_CHARS - 4)}..."
+        assert [line[:12] for line in lines[1:]] == [
+            "- user: 0000",
+            "- assistant:",
+            "- user: 0002",
+            "- assistant:",
+        ]
+
+    def test_history_chars_tracks_compacted_history(self):
+        """Test that the running size matches the history after compaction."""
+        state = SessionState()
+        _fill(state, 40, MAX_HISTORY_CHARS // 10)
+
+        assert state.conversation_history[0].metadata.get("summary")
+        assert state._history_chars == sum(len(m.content) for m in state.conversation_history)
+        assert state._history_chars <= MAX_HISTORY_CHARS
+
+    def test_earlier_summary_carried_forward(self):
+        """Test that a second compaction keeps the first summary's entries once."""
+        state = SessionState()
+        _fill(state, 40, MAX_HISTORY_CHARS // 10)
+
+        summaries = [m for m in state.conversation_history if m.metadata.get("summary")]
+        assert len(summaries) == 1
+        content = summaries[0].content
+        assert content.count("Summary of earlier conversation:") == 1
+        assert "- user: 0000" in content
+
+
+class TestContextMessages:
+    """Tests for the recent-message fast path of get_context_messages."""
+
+    @staticmethod
+    def assert_paths_agree(state: SessionState) -> None:
+        """Check the deque path against a plain slice of the history."""
+        history = state.conversation_history
+        for n in range(1, DEFAULT_CONTEXT_MESSAGES + 1):
+            assert state.get_context_messages(n) == history[-n:]
+        assert state.get_context_messages(DEFAULT_CONTEXT_MESSAGES + 5) == history[-15:]
+        assert state.get_context_messages(0) == history
+
+    def test_matches_history_slice(self):
+        """Test that short and long histories give the same result on both paths."""
+        state = SessionState()
+        _fill(state, 3, 10)
+        self.assert_paths_agree(state)
+
+        _fill(state, 20, 10)
+        self.assert_paths_agree(state)
+
+    def test_matches_after_from_dict(self):
+        """Test that a restored state rebuilds its recent messages."""
+        state = SessionState()
+        _fill(state, 20, 10)
+
+        restored = SessionState.from_dict(state.to_dict())
+
+        self.assert_paths_agree(restored)
+        assert [m.content for m in restored.get_context_messages()] == [
+            m.content for m in state.get_context_messages()
+        ]
+
+    def test_matches_after_compaction(self):
+        """Test that compaction leaves the recent messages in step."""
+        state = SessionState()
+        _fill(state, 40, MAX_HISTORY_CHARS // 10)
+
+        assert state.conversation_history[0].metadata.get("summary")
+        self.assert_paths_agree(state)
@@ -0,0 +1,98 @@
+"""
+Unit tests for Unity tool wrappers.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from shader_copilot.tools.unity_tools import UnityTools
+
+LATENCY = 0.1
+
+
+class _StubTransport:
+    """Answers every tool call after a fixed round-trip delay."""
+
+    def __init__(self):
+        self.sent: list[str] = []
+        self._responses: dict[str, asyncio.Future] = {}
+
+    def _future(self, tool_call_id):
+        if tool_call_id not in self._responses:
+            self._responses[tool_call_id] = asyncio.get_running_loop().create_future()
+        return self._responses[tool_call_id]
+
+    async def send_tool_call(self, tool_call_id, tool_name, arguments):
+        self.sent.append(tool_name)
+        future = self._future(tool_call_id)
+        response = {"success": True, "tool": tool_name, **arguments}
+        asyncio.get_running_loop().call_later(LATENCY, future.set_result, response)
+
+    async def wait_for_response(self, tool_call_id):
+        return await self._future(tool_call_id)
+
+
+class TestCallBatch:
+    """Tests for pipelined tool calls."""
+
+    @pytest.mark.asyncio
+    async def test_two_calls_take_one_round_trip(self):
+        """Test that batched calls overlap their round trips."""
+        transport = _StubTransport()
+        tools = UnityTools(transport.send_tool_call, transport.wait_for_response)
+
+        start = time.perf_counter()
+        responses = await tools.call_batch(
+            [
+                ("save_shader", {"shader_path": "a.shader"}),
+                ("save_material", {"material_path": "a.mat"}),
+            ]
+        )
+        elapsed = time.perf_counter() - start
+
+        assert [r["tool"] for r in responses] == ["save_shader", "save_material"]
+        assert responses[1]["material_path"] == "a.mat"
+        assert elapsed < LATENCY * 1.8
+
+
+class TestGather:
+    """Tests for running typed tool methods concurrently."""
+
+    @pytest.mark.asyncio
+    async def test_typed_calls_take_one_round_trip(self):
+        """Test that gathered typed calls overlap their round trips."""
+        transport = _StubTransport()
+        tools = UnityTools(transport.send_tool_call, transport.wait_for_response)
+
+        start = time.perf_counter()
+        shader, material = await tools.gather(
+            tools.save_shader("a.shader"), tools.save_material("a.mat")
+        )
+        elapsed = time.perf_counter() - start
+
+        assert shader["shader_path"] == "a.shader"
+        assert material["material_path"] == "a.mat"
+        assert elapsed < LATENCY * 1.8
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_the_other_calls(self):
+        """Test that one failing call cancels its siblings and raises."""
+        transport = _StubTransport()
+        tools = UnityTools(transport.send_tool_call, transport.wait_for_response)
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def fail():
+            raise RuntimeError("unity error")
+
+        with pytest.raises(ExceptionGroup):
+            await tools.gather(slow(), fail())
+        assert cancelled == [True]
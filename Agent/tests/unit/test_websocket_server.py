@@ -0,0 +1,264 @@
+"""
+Unit tests for WebSocket server message handlers.
+"""
+
+import asyncio
+
+import pytest
+import websockets
+
+from shader_copilot.server.messages import (
+    BaseMessage,
+    MessageType,
+    ServerMessageType,
+    SessionReadyPayload,
+)
+from shader_copilot.server.websocket_server import _INBOUND_QUEUE_SIZE, ShaderCopilotServer
+
+
+class TestSessionInit:
+    """Tests for SESSION_INIT handling."""
+
+    @pytest.fixture
+    def server(self):
+        """Create a server with default configuration."""
+        return ShaderCopilotServer()
+
+    @pytest.mark.asyncio
+    async def test_session_ready_matches_contract(self, server):
+        """Test that the trusted SESSION_READY payload validates at the boundary."""
+        message = BaseMessage(
+            type=MessageType.SESSION_INIT.value,
+            payload={"project_path": "/path/to/project", "config": {"max_retry_count": 5}},
+        )
+
+        response = await server._handle_session_init(message, {"websocket": object()})
+
+        assert response.type == ServerMessageType.SESSION_READY.value
+        ready = SessionReadyPayload.model_validate(response.payload)
+        assert ready.is_new is True
+
+    @pytest.mark.asyncio
+    async def test_session_config_is_applied(self, server):
+        """Test that the client config reaches the new session."""
+        message = BaseMessage(
+            type=MessageType.SESSION_INIT.value,
+            payload={"config": {"max_retry_count": 5, "model_config": {"code_model": "m"}}},
+        )
+        context = {"websocket": object()}
+
+        await server._handle_session_init(message, context)
+
+        config = context["session"].config
+        assert config.max_retry_count == 5
+        assert config.model_config.code_model == "m"
+        assert config.output_directory == "Assets/Shaders/Generated"
+
+    @pytest.mark.asyncio
+    async def test_invalid_session_config_rejected(self, server):
+        """Test that a badly typed client config fails at SESSION_INIT."""
+        message = BaseMessage(
+            type=MessageType.SESSION_INIT.value,
+            payload={
+                "config": {
+                    "max_retry_count": "lots",
+                    "model_config": {"code_model": 5},
+                    "output_directory": None,
+                }
+            },
+        )
+        context = {"websocket": object()}
+
+        response = await server._handle_session_init(message, context)
+
+        assert response.type == ServerMessageType.ERROR.value
+        assert response.payload["code"] == "INVALID_SESSION_INIT"
+        assert "session" not in context
+
+    @pytest.mark.asyncio
+    async def test_session_resume(self, server):
+        """Test that a known session_id resumes the existing session."""
+        init = BaseMessage(type=MessageType.SESSION_INIT.value, payload={})
+        first = await server._handle_session_init(init, {"websocket": object()})
+
+        resume = BaseMessage(
+            type=MessageType.SESSION_INIT.value,
+            payload={"session_id": first.payload["session_id"]},
+        )
+        second = await server._handle_session_init(resume, {"websocket": object()})
+
+        assert second.payload == {"session_id": first.payload["session_id"], "is_new": False}
+
+
+class TestUserMessage:
+    """Tests for USER_MESSAGE handling."""
+
+    @pytest.mark.asyncio
+    async def test_uses_session_from_connection_context(self):
+        """Test that the session stored by SESSION_INIT serves later messages."""
+        server = ShaderCopilotServer()
+        context = {"websocket": object()}
+        init = BaseMessage(type=MessageType.SESSION_INIT.value, payload={})
+        await server._handle_session_init(init, context)
+
+        message = BaseMessage(
+            type=MessageType.USER_MESSAGE.value, payload={"content": "Make it glow"}
+        )
+        response = await server._handle_user_message(message, context)
+
+        assert response.type == ServerMessageType.STREAM_CHUNK.value
+        assert context["session"].conversation_history[-1].content == "Make it glow"
+
+    @pytest.mark.asyncio
+    async def test_requires_session(self):
+        """Test that messages before SESSION_INIT are rejected."""
+        server = ShaderCopilotServer()
+        message = BaseMessage(type=MessageType.USER_MESSAGE.value, payload={"content": "hi"})
+
+        response = await server._handle_user_message(message, {"websocket": object()})
+
+        assert response.payload["code"] == "NO_SESSION"
+
+
+class TestSendStream:
+    """Tests for STREAM_CHUNK streaming."""
+
+    class _Socket:
+        def __init__(self):
+            self.frames = []
+
+        async def send(self, frame):
+            self.frames.append(BaseMessage.model_validate_json(frame).payload)
+            await asyncio.sleep(0)
+
+    @pytest.mark.asyncio
+    async def test_coalesces_chunks_sent_while_busy(self):
+        """Test that queued chunks are merged and the last frame is final."""
+        server = ShaderCopilotServer()
+        websocket = self._Socket()
+
+        async def chunks():
+            for token in ("Shader ", '"Custom/', 'Toon"', " {"):
+                yield token
+
+        await server.send_stream(websocket, chunks())
+
+        assert "".join(f["content"] for f in websocket.frames) == 'Shader "Custom/Toon" {'
+        assert len(websocket.frames) < 4
+        assert [f["is_final"] for f in websocket.frames][-1] is True
+
+    @pytest.mark.asyncio
+    async def test_empty_stream_sends_final_frame(self):
+        """Test that an empty producer still terminates the stream."""
+        server = ShaderCopilotServer()
+        websocket = self._Socket()
+
+        async def chunks():
+            return
+            yield
+
+        await server.send_stream(websocket, chunks())
+
+        assert websocket.frames == [{"content": "", "is_final": True}]
+
+    @pytest.mark.asyncio
+    async def test_failed_stream_is_not_marked_final(self):
+        """Test that a failing producer raises without sending a final frame."""
+        server = ShaderCopilotServer()
+        websocket = self._Socket()
+
+        async def chunks():
+            yield "partial"
+            raise RuntimeError("LLM request failed")
+
+        with pytest.raises(RuntimeError, match="LLM request failed"):
+            await server.send_stream(websocket, chunks())
+
+        assert "".join(f["content"] for f in websocket.frames) == "partial"
+        assert not any(f["is_final"] for f in websocket.frames)
+
+
+class TestConnectionHandler:
+    """Tests for the per-connection read/dispatch loop."""
+
+    class _Socket:
+        remote_address = ("127.0.0.1", 0)
+
+        def __init__(self):
+            self.inbox: asyncio.Queue = asyncio.Queue()
+            self.sent: asyncio.Queue = asyncio.Queue()
+
+        async def recv(self, decode=None):
+            frame = await self.inbox.get()
+            if frame is None:
+                raise websockets.ConnectionClosed(None, None)
+            return frame
+
+        async def send(self, frame):
+            self.sent.put_nowait(BaseMessage.model_validate_json(frame))
+
+        async def close(self, code=1000, reason=""):
+            self.close_code = code
+
+    @pytest.mark.asyncio
+    async def test_ping_answered_while_handler_busy(self):
+        """Test that heartbeats bypass a handler blocked on slow work."""
+        server = ShaderCopilotServer()
+        release = asyncio.Event()
+
+        async def slow_handler(message, context):
+            await release.wait()
+            return BaseMessage(type=ServerMessageType.TASK_COMPLETE.value)
+
+        server.message_handler.register_handler(MessageType.USER_MESSAGE, slow_handler)
+        websocket = self._Socket()
+        connection = asyncio.create_task(server._connection_handler(websocket))
+
+        websocket.inbox.put_nowait(b'{"type": "USER_MESSAGE", "payload": {}}')
+        websocket.inbox.put_nowait(b'{"type": "ping", "payload": {}}')
+        first = await asyncio.wait_for(websocket.sent.get(), 1)
+        release.set()
+        second = await asyncio.wait_for(websocket.sent.get(), 1)
+
+        websocket.inbox.put_nowait(None)
+        await asyncio.wait_for(connection, 1)
+        assert [first.type, second.type] == ["pong", "TASK_COMPLETE"]
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_failure_closes_connection(self, caplog):
+        """Test that a failing dispatcher is logged and ends the connection."""
+        server = ShaderCopilotServer()
+
+        async def failing_handler(message, context):
+            raise RuntimeError("send failed")
+
+        server.message_handler.dispatch = failing_handler
+        websocket = self._Socket()
+        # More frames than the inbound queue holds, so a reader left running
+        # would block on a full queue
+        for _ in range(_INBOUND_QUEUE_SIZE + 2):
+            websocket.inbox.put_nowait(b'{"type": "USER_MESSAGE", "payload": {}}')
+
+        await asyncio.wait_for(server._connection_handler(websocket), 1)
+
+        assert websocket.close_code == 1011
+        assert "Dispatcher failed" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_client_leaving_mid_response_is_not_an_error(self, caplog):
+        """Test that a send to a closed socket ends the connection quietly."""
+        server = ShaderCopilotServer()
+
+        async def closed_handler(message, context):
+            raise websockets.ConnectionClosed(None, None)
+
+        server.message_handler.dispatch = closed_handler
+        websocket = self._Socket()
+        websocket.inbox.put_nowait(b'{"type": "USER_MESSAGE", "payload": {}}')
+
+        with caplog.at_level("INFO"):
+            await asyncio.wait_for(server._connection_handler(websocket), 1)
+
+        assert not hasattr(websocket, "close_code")
+        assert "Dispatcher failed" not in caplog.text
+        assert "Connection closed" in caplog.text